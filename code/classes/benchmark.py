@@ -0,0 +1,312 @@
+from code.classes.solver import Solver
+from code.classes.experiment import COOLING_METHODS
+from code.classes.parser import AnnealingParameters
+from code.classes import kernels
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import dataclasses
+import contextlib
+import argparse
+import platform
+import tracemalloc
+import json
+import time
+import sys
+import io
+import os
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARK_PROBLEM_SETS = ('eil51', 'a280', 'pcb442')
+SYNTHETIC_INSTANCES = ('uniform2000-0', 'clustered2000-0', 'uniform20000-0', 'clustered20000-0')
+TIME_BUDGETS = (1.0, 5.0)
+# Steps per second are absolute, so the baseline only gates runs on the machine it was recorded on: re-record it
+# with --update-baseline on every machine that gates. Cases that ran another kernel or in another environment than
+# their baseline are not compared on throughput and memory
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), '../..', 'benchmarks', 'baseline.json')
+
+# The fewest timed runs per case of results that can gate, as the fastest of fewer runs is too noisy
+MIN_GATE_REPEATS = 3
+
+# Relative drop in steps per second and relative growth in memory that count as a regression,
+# and the absolute growth of the gap to the optimal tour
+TOLERANCES = {'steps_per_second': 0.25, 'memory': 0.25, 'gap': 0.05}
+
+
+def benchmark_parameters(problem_set: str, **overrides) -> AnnealingParameters:
+    """
+    The parameters of a benchmark run: neighbor proposals on the nearest neighbor tour, with the initial and the
+    final temperature given by acceptance ratios, so that every cooling method and chain count spans the same range.
+    """
+    params = AnnealingParameters(
+        problem_set=problem_set,
+        save_data=False,
+        folder_name='benchmark',
+        markov_chain_length=1000,
+        num_markov_chains=500,
+        seed=0,
+        record_policy='none',
+        proposal='neighbor',
+        initial_tour='nearest_neighbor',
+        initial_acceptance=0.05,
+        final_acceptance=0.001,
+    )
+    return dataclasses.replace(params, **overrides)
+
+
+def run_benchmarks(problem_sets: list = None, synthetic: list = SYNTHETIC_INSTANCES, coolings: list = None,
+                   time_budgets: list = TIME_BUDGETS, repeats: int = 3, **overrides) -> dict:
+    """
+    Benchmark the annealing engine on every problem set with every cooling method. Every measurement runs in a
+    fresh process, so that the peak resident set size is that of the measured run alone.
+    - throughput: the steps per second of the fastest of repeats runs of benchmark_parameters.
+    - memory: the peak traced allocation and the number of allocated blocks left at the end of the same run under
+      tracemalloc, which slows the run down and so is measured separately.
+    - quality: the gap of the final tour to the optimal tour for runs that fit in each time budget, with the number
+      of Markov chains set from the measured throughput. For synthetic instances the gap is to their reference tour.
+    pre:
+    - problem_sets must hold names of sets in TSP-Configurations or paths of TSPLIB files, None uses
+      BENCHMARK_PROBLEM_SETS, and synthetic the names of the synthetic instances to add, which the Board
+      generates on first use (see generator).
+    - coolings must be keys of COOLING_METHODS, None uses all of them.
+    - overrides are passed to benchmark_parameters.
+    post:
+    - Returns a JSON serializable dict with the environment, the number of repeats and one result per problem set
+      and cooling method.
+    """
+    problem_sets = list(BENCHMARK_PROBLEM_SETS if problem_sets is None else problem_sets) + list(synthetic)
+    coolings = list(COOLING_METHODS if coolings is None else coolings)
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for problem_set in problem_sets:
+        for cooling in coolings:
+            params = benchmark_parameters(problem_set, **overrides)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                throughput = executor.submit(_measure, params, cooling, False, repeats).result()
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                memory = executor.submit(_measure, params, cooling, True).result()
+
+            budgets = []
+            for budget in time_budgets:
+                num_markov_chains = max(2, int(budget * throughput['steps_per_second'] / params.markov_chain_length))
+                budget_params = dataclasses.replace(params, num_markov_chains=num_markov_chains)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    run = executor.submit(_measure, budget_params, cooling, False).result()
+                budgets.append({
+                    'time_budget': budget,
+                    'num_markov_chains': num_markov_chains,
+                    'elapsed_time': run['elapsed_time'],
+                    'final_length': run['final_length'],
+                    'gap': run['gap'],
+                })
+
+            results.append({
+                'name': f'{_instance_name(problem_set)}-{cooling}',
+                'instance': _instance_name(problem_set),
+                'cooling': cooling,
+                'num_nodes': throughput['num_nodes'],
+                'kernel': throughput['kernel'],
+                'steps': throughput['steps'],
+                'elapsed_time': throughput['elapsed_time'],
+                'steps_per_second': throughput['steps_per_second'],
+                'peak_rss': throughput['peak_rss'],
+                'traced_peak': memory['traced_peak'],
+                'allocated_blocks': memory['allocated_blocks'],
+                'gap': throughput['gap'],
+                'time_budgets': budgets,
+            })
+            print(f"{results[-1]['name']}: {throughput['steps_per_second']:.0f} steps/s")
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': kernels.numba.__version__ if kernels.NUMBA_AVAILABLE else None,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'parameters': dataclasses.asdict(benchmark_parameters(None, **overrides)),
+        'repeats': repeats,
+        'results': results,
+    }
+
+
+def _instance_name(problem_set: str) -> str:
+    """
+    The name of a problem set, its file name without suffixes for a path.
+    """
+    return os.path.basename(problem_set).removesuffix('.txt').removesuffix('.tsp')
+
+
+def _measure(params: AnnealingParameters, cooling: str, trace_memory: bool, repeats: int = 1) -> dict:
+    """
+    Run one annealing run in a worker process and measure it.
+    A short run on the same parameters comes first, so that a compiled kernel is loaded before the timing starts.
+    The run is repeated repeats times and the fastest time is kept, as timeit does, as the runs are identical
+    for the same seed and the slower ones only measure interference from the rest of the machine.
+    post:
+    - Returns the number of nodes, the kernel, the steps and the elapsed seconds of the run, the steps per second,
+      the final length and its gap to the optimal tour (None without one) and the peak resident set size of
+      the process in bytes (None where the resource module is missing).
+    - With trace_memory the peak traced allocation in bytes and the number of blocks allocated by the run that
+      are still held at its end are added.
+    """
+    warm_up = Solver(dataclasses.replace(params, markov_chain_length=10, num_markov_chains=2))
+    with contextlib.redirect_stdout(io.StringIO()):
+        getattr(warm_up, COOLING_METHODS[cooling])()
+
+    if trace_memory:
+        tracemalloc.start()
+    elapsed_time = np.inf
+    for _ in range(repeats):
+        solver = Solver(params)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            getattr(solver, COOLING_METHODS[cooling])()
+            elapsed_time = min(elapsed_time, time.perf_counter() - start_time)
+
+    result = {}
+    if trace_memory:
+        result['traced_peak'] = tracemalloc.get_traced_memory()[1]
+        result['allocated_blocks'] = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+
+    final_length = solver.board.calculate_tour_distance()
+    optimal_length = solver.board.calculate_tour_solution_distance()
+    steps = len(solver.all_lengths)
+    result.update({
+        'num_nodes': len(solver.board.tour),
+        'kernel': 'numba' if solver.use_kernel else 'numpy',
+        'steps': steps,
+        'elapsed_time': elapsed_time,
+        'steps_per_second': steps / elapsed_time,
+        'final_length': final_length,
+        'gap': final_length / optimal_length - 1 if optimal_length is not None else None,
+        'peak_rss': _peak_rss(),
+    })
+    return result
+
+
+def _peak_rss() -> int:
+    """
+    The peak resident set size of this process in bytes, or None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def compare(results: dict, baseline: dict, tolerances: dict = None) -> tuple:
+    """
+    Compare benchmark results with a baseline of the same cases, see TOLERANCES.
+    Throughput and memory are only compared for cases that ran the same kernel as their baseline case, in the same
+    environment, as both change with either. The gaps are compared for every case, as the kernels give the same
+    tours for the same seed.
+    pre:
+    - results and, where it is recorded, baseline must have at least MIN_GATE_REPEATS repeats.
+    post:
+    - Returns the list of regressions and the list of notes on what was not compared. A regression is a drop in
+      steps per second, a growth in peak resident set size or traced peak allocation, or a growth in the gap to
+      the optimal tour at the end of a run or a time budget. Cases that are missing from the baseline are skipped.
+    """
+    for name, benchmark in (('results', results), ('baseline', baseline)):
+        if benchmark.get('repeats', MIN_GATE_REPEATS) < MIN_GATE_REPEATS:
+            raise ValueError(f'The {name} were measured with {benchmark["repeats"]} repeats, '
+                             f'gating needs at least {MIN_GATE_REPEATS}')
+
+    tolerances = {**TOLERANCES, **(tolerances or {})}
+    baseline_cases = {case['name']: case for case in baseline['results']}
+    same_environment = results['environment'] == baseline['environment']
+    regressions, notes = [], []
+    if not same_environment:
+        notes.append('The environment differs from the baseline, throughput and memory are not compared: '
+                     're-record the baseline on this machine with --update-baseline')
+
+    for case in results['results']:
+        reference = baseline_cases.get(case['name'])
+        if reference is None:
+            continue
+
+        name = case['name']
+        same_kernel = case['kernel'] == reference['kernel']
+        if not same_kernel:
+            notes.append(f"{name}: kernel {case['kernel']}, baseline {reference['kernel']}, "
+                         f"throughput and memory are not compared")
+        if same_environment and same_kernel:
+            if case['steps_per_second'] < (1 - tolerances['steps_per_second']) * reference['steps_per_second']:
+                regressions.append(f"{name}: {case['steps_per_second']:.0f} steps/s, "
+                                   f"baseline {reference['steps_per_second']:.0f}")
+            for key in ('peak_rss', 'traced_peak'):
+                if None not in (case[key], reference[key]) and case[key] > (1 + tolerances['memory']) * reference[key]:
+                    regressions.append(f"{name}: {key} {case[key] / 2 ** 20:.1f} MiB, "
+                                       f"baseline {reference[key] / 2 ** 20:.1f} MiB")
+
+        gaps = [('final', case['gap'], reference['gap'])]
+        references = {budget['time_budget']: budget for budget in reference['time_budgets']}
+        for budget in case['time_budgets']:
+            if budget['time_budget'] in references:
+                gaps.append((f"{budget['time_budget']:g}s budget", budget['gap'],
+                             references[budget['time_budget']]['gap']))
+        for label, gap, reference_gap in gaps:
+            if None not in (gap, reference_gap) and gap > reference_gap + tolerances['gap']:
+                regressions.append(f"{name}: {label} gap {gap:.2%}, baseline {reference_gap:.2%}")
+    return regressions, notes
+
+
+def write_results(results: dict, path: str):
+    """
+    Write benchmark results to a JSON file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved to: {os.path.abspath(path)}")
+
+
+def read_results(path: str) -> dict:
+    """
+    Read benchmark results from a JSON file.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the throughput, memory and solution quality of the solver.')
+    parser.add_argument('--output', default='output/benchmark.json', help='JSON file to write the results to')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='JSON file of the results to compare with')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--problem-sets', nargs='*', default=None, help='problem sets or TSPLIB files')
+    parser.add_argument('--synthetic', nargs='*', default=list(SYNTHETIC_INSTANCES),
+                        help='synthetic instances, e.g. clustered20000-0')
+    parser.add_argument('--coolings', nargs='*', default=None, choices=list(COOLING_METHODS))
+    parser.add_argument('--time-budgets', nargs='*', type=float, default=list(TIME_BUDGETS))
+    parser.add_argument('--repeats', type=int, default=MIN_GATE_REPEATS,
+                        help=f'timed runs per case, the fastest is kept; fewer than {MIN_GATE_REPEATS} are not '
+                             f'compared with the baseline')
+    args = parser.parse_args()
+    if args.update_baseline and args.repeats < MIN_GATE_REPEATS:
+        parser.error(f'--repeats must be at least {MIN_GATE_REPEATS} to update the baseline')
+
+    benchmark = run_benchmarks(args.problem_sets, args.synthetic, args.coolings, args.time_budgets,
+                               args.repeats)
+    write_results(benchmark, args.output)
+    if args.update_baseline:
+        write_results(benchmark, args.baseline)
+    elif args.repeats < MIN_GATE_REPEATS:
+        print(f"Not compared with the baseline: gating needs at least {MIN_GATE_REPEATS} repeats.")
+    elif os.path.isfile(args.baseline):
+        found, notes = compare(benchmark, read_results(args.baseline))
+        for note in notes:
+            print(f"Not compared: {note}")
+        for message in found:
+            print(f"Regression: {message}")
+        if found:
+            sys.exit(1)
+        print("No regressions against the baseline.")
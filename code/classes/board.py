@@ -1,13 +1,44 @@
 import os
-import math as m
+import tempfile
 import numpy as np
-from typing import List
+from typing import List, Tuple
+from code.classes import tsplib, generator
+from code.classes.schedules import temperature_for_acceptance
+from code.classes.tours import TwoLevelList
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), '../..', 'TSP-Configurations')
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '../..', 'TSP-Cache')
+DISTANCE_METRICS = {'exact', 'tsplib'}
+TOUR_BACKENDS = {'auto', 'array', 'two_level'}
+
+# tour_backend 'auto' stores the tour as an array: at 100k nodes the array is over twice as fast as the two-level
+# list, for neighbor proposals on the greedy tour and uniform proposals on the file tour, as most accepted reversals
+# are short or the array takes the shorter side; the list only wins for neighbor proposals on an unoptimized tour
+
+# Larger instances compute their distances on the fly, their matrix would take more than 800 MB
+MATRIX_MAX_NODES = 10000
+# Entries of the distance matrix computed at once, see _build_distance_matrix
+MATRIX_BLOCK_SIZE = 1 << 20
+
+# Mean probability with which the uphill neighbor 2-opt moves from the initial tour should be accepted at the start of
+# the anneal, see temperature_for_acceptance: a tour in file order must be untangled, constructed tours already hold
+# good structure worth keeping
+INITIAL_TOUR_ACCEPTANCE = {'file': 0.5, 'nearest_neighbor': 0.05, 'greedy': 0.04, 'hilbert': 0.12}
+
+# Moves are (kind, a, b, c) tuples of tour indices: (TWO_OPT, index1, index2, 0), (NODE_SWAP, index1, index2, 0)
+# and (INSERTION or INSERTION_REVERSED, start, end, target) for segment insertions, which include Or-opt.
+# The two-level list backend has no indices, its moves are (NODE_TWO_OPT, node1, node2, 0) tuples of node indices,
+# the 2-opt move that replaces the edges from node1 and node2 to their successors by node1 - node2 and the successors
+TWO_OPT, NODE_SWAP, INSERTION, INSERTION_REVERSED, NODE_TWO_OPT = 0, 1, 2, 3, 4
 
 
 class Node:
+    __slots__ = ('ID', 'x', 'y')
+
     def __init__(self, ID: int, x: float, y: float):
         """
-        Initialize a Node instance.
+        Initialize a Node instance. Nodes are lightweight views of one city of a Board,
+        the Board itself stores the tour and coordinates as NumPy arrays.
         pre:
         - ID must be a positive integer.
         - x and y must be valid float coordinates.
@@ -19,88 +50,490 @@ class Node:
         self.y = y
 
 
+def apply_move(tour: np.ndarray, move: tuple) -> Tuple[int, int]:
+    """
+    Apply a move to a tour array in place.
+    pre:
+    - move must be a valid move tuple for the tour, see Board.move_delta.
+    post:
+    - Returns the first and last index of the part of the tour that changed. If first > last, the changed part
+      wraps around the end of the array and consists of first..n - 1 and 0..last.
+    - A 2-opt move that reverses more than half of the tour reverses the rest of the tour instead,
+      which gives the same cycle traversed in the other direction.
+    """
+    kind, a, b, c = move
+    if kind == TWO_OPT:
+        if a > b:
+            a, b = b, a
+        n = len(tour)
+        if 2 * (b - a + 1) <= n:
+            tour[a:b + 1] = tour[a:b + 1][::-1]
+            return a, b
+        rest = np.concatenate((tour[b + 1:], tour[:a]))[::-1]
+        tour[b + 1:] = rest[:n - b - 1]
+        tour[:a] = rest[n - b - 1:]
+        return b + 1, a - 1
+    if kind == NODE_SWAP:
+        tour[a], tour[b] = tour[b], tour[a]
+        return min(a, b), max(a, b)
+
+    # Segment insertion: the segment start..end moves between target and target + 1
+    segment = (tour[a:b + 1][::-1] if kind == INSERTION_REVERSED else tour[a:b + 1]).copy()
+    if c > b:
+        tour[a:c - len(segment) + 1] = tour[b + 1:c + 1]
+        tour[c - len(segment) + 1:c + 1] = segment
+        return a, c
+    tour[c + 1 + len(segment):b + 1] = tour[c + 1:a]
+    tour[c + 1:c + 1 + len(segment)] = segment
+    return c + 1, b
+
+
+def nearest_neighbors(x: np.ndarray, y: np.ndarray, k: int) -> np.ndarray:
+    """
+    Find the k nearest neighbors of every point with a uniform grid index.
+    The points are bucketed into square cells holding about k points each; the neighbors of the points in a cell
+    are searched in the block of cells around it, which grows ring by ring until every point of the cell has
+    k candidates closer than the distance to the edge of the block, so the result is exact.
+    pre:
+    - x and y must be coordinate arrays of equal length n >= 2, k must be positive.
+    post:
+    - Returns an (n, min(k, n - 1)) int32 array with the neighbor indices of every point, sorted by distance
+      and, for equal distances, by index.
+    """
+    n = len(x)
+    k = min(k, n - 1)
+    width = max(x.max() - x.min(), y.max() - y.min())
+    cell_size = max(width * np.sqrt((k + 1) / n), np.finfo(float).tiny)
+    cells_x = ((x - x.min()) / cell_size).astype(np.int64)
+    cells_y = ((y - y.min()) / cell_size).astype(np.int64)
+    num_cells_x, num_cells_y = cells_x.max() + 1, cells_y.max() + 1
+
+    # Points sorted by cell, cell_start[c]:cell_start[c + 1] are the points of cell c
+    cells = cells_x * num_cells_y + cells_y
+    order = np.argsort(cells, kind='stable')
+    cell_start = np.searchsorted(cells[order], np.arange(num_cells_x * num_cells_y + 1))
+
+    neighbors = np.empty((n, k), dtype=np.int32)
+    for cell in np.unique(cells):
+        points = order[cell_start[cell]:cell_start[cell + 1]]
+        cell_x, cell_y = divmod(int(cell), int(num_cells_y))
+        ring = 1
+        while True:
+            block_x = np.arange(max(cell_x - ring, 0), min(cell_x + ring, num_cells_x - 1) + 1)
+            block_y = np.arange(max(cell_y - ring, 0), min(cell_y + ring, num_cells_y - 1) + 1)
+            block = (block_x[:, None] * num_cells_y + block_y[None, :]).ravel()
+            candidates = np.sort(np.concatenate([order[cell_start[c]:cell_start[c + 1]] for c in block]))
+
+            distances = np.hypot(x[points, None] - x[candidates], y[points, None] - y[candidates])
+            distances[points[:, None] == candidates] = np.inf
+            covers_all = len(block_x) == num_cells_x and len(block_y) == num_cells_y
+            if len(candidates) > k:
+                nearest = np.argsort(distances, axis=1, kind='stable')[:, :k]
+                kth_distance = np.take_along_axis(distances, nearest[:, -1:], axis=1).max()
+                if covers_all or kth_distance <= ring * cell_size:
+                    neighbors[points] = candidates[nearest]
+                    break
+            ring += 1
+    return neighbors
+
+
 class Board:
-    def __init__(self, params):
+    def __init__(self, params, instance: dict = None):
         """
-        Initialize a Board instance for a given TSP problem set.
-        The tour_order list is initialized with the nodes in the order they are read from the file.
+        Initialize a Board instance for a given TSP problem set, the name of a set in TSP-Configurations
+        or the path of any TSPLIB file with node coordinates (see tsplib.EDGE_WEIGHT_TYPES).
+        Cities are stored as struct-of-arrays coordinates x and y, indexed by node ID - 1,
+        and the tour is an int32 permutation of these indices.
+        The tour is initialized with the nodes in the order they are read from the file, or constructed
+        with the method in params.initial_tour, see construct_tour.
+        If instance is given (see shared.attach), the coordinates, solution and distance matrix are taken
+        from its arrays instead of the files.
+        Instances of more than MATRIX_MAX_NODES nodes compute their distances on the fly instead of storing
+        a matrix, and params.tour_backend selects how the tour is stored, see TOUR_BACKENDS.
         """
         self.problem_set = params.problem_set
-        if self.problem_set not in {'eil51', 'a280', 'pcb442'}:
-            raise ValueError('Invalid problem set: choose eil51, a280 or pcb442')
-        
-        self.tour_order: List[Node] = self.read_nodes()
-        self.tour_solution: List[Node] = self.read_solution()
+        self.tsp_path, self.tour_path = self._find_files(self.problem_set)
+        self.name = os.path.basename(self.tsp_path).removesuffix('.txt').removesuffix('.tsp')
+
+        self.distance_metric = params.distance_metric
+        if self.distance_metric not in DISTANCE_METRICS:
+            raise ValueError('Invalid distance metric: choose exact or tsplib')
+
+        self.initial_tour = params.initial_tour
+        if self.initial_tour not in INITIAL_TOUR_ACCEPTANCE:
+            raise ValueError(f'Invalid initial tour: choose one of {", ".join(INITIAL_TOUR_ACCEPTANCE)}')
+
+        self.tour_backend = params.tour_backend
+        if self.tour_backend not in TOUR_BACKENDS:
+            raise ValueError(f'Invalid tour backend: choose one of {", ".join(TOUR_BACKENDS)}')
+
+        self.num_neighbors = params.num_neighbors
+        self._neighbors = None
+        self._position = None
+        self.linked = None
+
+        if instance is None:
+            self.file_tour, self.x, self.y = self.read_nodes()
+            self.solution = self.read_solution()
+            if len(self.x) <= MATRIX_MAX_NODES:
+                self.distance_matrix = self._load_distance_matrix()
+            else:
+                self.distance_matrix = self._on_the_fly_distances()
+        else:
+            if (instance['problem_set'], instance['distance_metric']) != (self.problem_set, self.distance_metric):
+                raise ValueError('Instance does not match the problem set and distance metric of the parameters')
+            self.edge_weight_type, self.digest = instance['edge_weight_type'], instance['digest']
+            self.file_tour = instance['file_tour']
+            self.x, self.y = instance['x'], instance['y']
+            self.solution = instance['solution']
+            self.distance_matrix = instance['distance_matrix']
+            if self.distance_matrix is None:
+                self.distance_matrix = self._on_the_fly_distances()
+
+        if self.tour_backend == 'auto':
+            self.tour_backend = 'array'
+        self.tour = self.construct_tour(self.initial_tour)
         self.tour_distance = self.calculate_tour_distance()
 
-    def read_nodes(self) -> List[Node]:
+    @property
+    def tour(self) -> np.ndarray:
+        """
+        The tour as an int32 array of node indices. Assigning a new tour invalidates the position index.
+        Moves do not rotate the array back to node index 0, start_index tracks where node index 0 is
+        and order_tour rotates the tour when a canonical tour is needed.
+        With the two-level list backend, the array is a new copy of the list, starting with node index 0.
+        """
+        if self.linked is not None:
+            return self.linked.to_array()
+        return self._tour
+
+    @tour.setter
+    def tour(self, tour: np.ndarray):
+        if self.tour_backend == 'two_level':
+            self.linked = TwoLevelList(tour)
+            self._tour = None
+            self.start_index = 0
+        else:
+            self.linked = None
+            self._tour = tour
+            self.start_index = int(np.argmax(tour == 0))
+        self._position = None
+
+    def set_tour_backend(self, backend: str):
+        """
+        Store the current tour in another backend, 'array' or 'two_level'.
+        """
+        if backend not in TOUR_BACKENDS - {'auto'}:
+            raise ValueError('Invalid tour backend: choose array or two_level')
+        tour = self.tour
+        self.tour_backend = backend
+        self.tour = tour
+
+    @property
+    def position(self) -> np.ndarray:
         """
-        Read nodes from the TSP configuration file.
+        The position index of the tour: position[node index] is the index of the node in the tour.
+        It is built on first use and then kept up to date by two_opt_swap and order_tour.
+        With the two-level list backend it is built from the tour on every use.
+        """
+        if self.linked is not None:
+            tour = self.tour
+            position = np.empty(len(tour), dtype=np.int32)
+            position[tour] = np.arange(len(tour), dtype=np.int32)
+            return position
+        if self._position is None:
+            self._position = np.empty(len(self._tour), dtype=np.int32)
+            self._position[self._tour] = np.arange(len(self._tour), dtype=np.int32)
+        return self._position
+
+    @property
+    def neighbors(self) -> np.ndarray:
+        """
+        The candidate lists: neighbors[node index] holds the indices of the num_neighbors nearest nodes,
+        sorted by distance. They are computed on first use with a grid index over the coordinates,
+        so they do not need the distance matrix.
+        """
+        if self._neighbors is None:
+            self._neighbors = nearest_neighbors(self.x, self.y, self.num_neighbors)
+        return self._neighbors
+
+    @staticmethod
+    def _find_files(problem_set: str) -> Tuple[str, str]:
+        """
+        Find the TSPLIB file of a problem set and its optimal tour file.
         pre:
-        - The file path corresponding to the problem_set must exist and contain valid node data.
+        - problem_set must be a path to a TSPLIB file, or the name of a set with a {name}.tsp.txt or {name}.tsp
+          file in TSP-Configurations, or the name of a synthetic instance (e.g. clustered10000-0, see generator),
+          which is generated with its reference tour on first use.
         post:
-        - Returns a list of Node objects matching the specified dimension in the file.
-        - Raises ValueError if the number of nodes does not match the dimension.
+        - Returns the path of the TSPLIB file and the path of the {name}.opt.tour.txt or {name}.opt.tour file
+          next to it, or None if there is none.
+        - Raises ValueError if no TSPLIB file is found.
         """
-        path = os.path.join(os.path.dirname(__file__), '../..', 'TSP-Configurations', f'{self.problem_set}.tsp.txt')
-        dimension = 0
-        nodes = []
-        start_processing = False
-        with open(path) as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.startswith('DIMENSION'):
-                    line = line.strip()
-                    dimension = int(line.split()[-1])
-                    continue
-                if line.startswith('NODE_COORD_SECTION'):
-                    start_processing = True
-                    continue
-                if start_processing:
-                    if line.startswith('EOF'):
-                        continue
-                    node = line.strip().split()
-                    nodes.append(Node(int(node[0]), float(node[1]), float(node[2])))
-
-        if len(nodes) != dimension:
-            raise ValueError('Number of nodes does not match dimension')
-        
-        return nodes
+        if problem_set is not None and os.path.isfile(problem_set):
+            tsp_path = problem_set
+        else:
+            candidates = [os.path.join(CONFIG_DIR, f'{problem_set}{suffix}') for suffix in ('.tsp.txt', '.tsp')]
+            tsp_path = next((path for path in candidates if os.path.isfile(path)), None)
+            if tsp_path is None and generator.parse_name(problem_set) is not None:
+                tsp_path = generator.generate(*generator.parse_name(problem_set))
+            if tsp_path is None:
+                raise ValueError(f'Invalid problem set {problem_set}: give the path of a TSPLIB file, '
+                                 f'the name of a set in TSP-Configurations or of a synthetic instance')
+
+        base = tsp_path.removesuffix('.txt').removesuffix('.tsp')
+        candidates = [f'{base}.opt.tour.txt', f'{base}.opt.tour']
+        tour_path = next((path for path in candidates if os.path.isfile(path)), None)
+        return tsp_path, tour_path
 
-    def read_solution(self) -> List[Node]:
+    def read_nodes(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Read the optimal tour solution from the TSP configuration file.
+        Read nodes from the TSPLIB file, through the parsed-instance cache in TSP-Cache.
         pre:
-        - The file path corresponding to the problem_set must exist and contain valid solution data.
+        - The TSPLIB file of the problem set must contain a valid NODE_COORD_SECTION.
         post:
-        - Returns a list of Node objects representing the optimal tour solution.
+        - Returns the tour in file order as an int32 array of node indices (node ID - 1),
+          and the x and y coordinates as float arrays indexed by node index.
+        - Sets the edge weight type and the digest of the file.
+        - Raises ValueError if the number of nodes does not match the dimension, the node IDs
+          are not numbered 1 to dimension or the edge weight type is not supported.
+        """
+        instance = tsplib.load_instance(self.tsp_path, CACHE_DIR)
+        self.edge_weight_type = instance['edge_weight_type']
+        self.digest = instance['digest']
+        return instance['file_tour'], instance['x'], instance['y']
+
+    def read_solution(self) -> np.ndarray:
+        """
+        Read the optimal tour solution from the optimal tour file, if the problem set has one.
+        pre:
+        - The nodes must be read.
+        post:
+        - Returns an int32 array of node indices representing the optimal tour solution, or None.
         - Raises ValueError if the number of nodes does not match the dimension.
         """
-        path = os.path.join(os.path.dirname(__file__), '../..', 'TSP-Configurations', f'{self.problem_set}.opt.tour.txt')
-        dimension = 0
-        solution_order = []
-        start_processing = False
-        with open(path) as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.startswith('DIMENSION'):
-                    line = line.strip()
-                    dimension = int(line.split()[-1])
-                    continue
-                if line.startswith('TOUR_SECTION'):
-                    start_processing = True
-                    continue
-                if start_processing:
-                    if line.startswith('-1'):
-                        break
-                    node = line.strip().split()
-                    solution_order.append(int(node[0]))
-
-        if len(solution_order) != dimension:
-            raise ValueError('Number of nodes does not match dimension')
-
-        id_to_node = {node.ID: node for node in self.tour_order}
-        return [id_to_node[node_id] for node_id in solution_order]
+        if self.tour_path is None:
+            return None
+        return tsplib.read_tour(self.tour_path, len(self.x))
+
+    def construct_tour(self, method: str) -> np.ndarray:
+        """
+        Construct a tour with one of the methods of INITIAL_TOUR_ACCEPTANCE.
+        - 'file': the nodes in the order of the configuration file.
+        - 'nearest_neighbor': start at node ID 1 and repeatedly move to the nearest unvisited node.
+        - 'greedy': add the shortest candidate edges that keep every node at degree two or less and close
+          no cycle, then join the fragments nearest endpoint first.
+        - 'hilbert': order the nodes along a Hilbert space-filling curve.
+        pre:
+        - The coordinates must be loaded. The methods use the coordinates and candidate lists, not the distance matrix.
+        post:
+        - Returns the tour as a new int32 array of node indices, starting with node index 0.
+        """
+        if method == 'file':
+            tour = np.array(self.file_tour, dtype=np.int32)
+        elif method == 'nearest_neighbor':
+            tour = self._nearest_neighbor_tour()
+        elif method == 'greedy':
+            tour = self._greedy_tour()
+        elif method == 'hilbert':
+            tour = self._hilbert_tour()
+        else:
+            raise ValueError(f'Invalid initial tour: choose one of {", ".join(INITIAL_TOUR_ACCEPTANCE)}')
+        return np.roll(tour, -int(np.argmax(tour == 0)))
+
+    def _nearest_neighbor_tour(self) -> np.ndarray:
+        """
+        Build the nearest neighbor tour, looking up the next node in the candidate list and only scanning
+        all unvisited nodes when every candidate has been visited.
+        """
+        n = len(self.x)
+        neighbors = self.neighbors.tolist()
+        visited = np.zeros(n, dtype=bool)
+        tour = np.empty(n, dtype=np.int32)
+        current = 0
+        for step in range(n):
+            tour[step] = current
+            visited[current] = True
+            for candidate in neighbors[current]:
+                if not visited[candidate]:
+                    current = candidate
+                    break
+            else:
+                unvisited = np.flatnonzero(~visited)
+                if len(unvisited) == 0:
+                    break
+                distances = np.hypot(self.x[unvisited] - self.x[current], self.y[unvisited] - self.y[current])
+                current = unvisited[np.argmin(distances)]
+        return tour
+
+    def _greedy_tour(self) -> np.ndarray:
+        """
+        Build the greedy edge tour from the candidate edges, sorted by length with a stable tie break on the nodes.
+        """
+        n = len(self.x)
+        first = np.repeat(np.arange(n), self.neighbors.shape[1])
+        second = self.neighbors.ravel()
+        edges = np.unique(np.column_stack([np.minimum(first, second), np.maximum(first, second)]), axis=0)
+        lengths = np.hypot(self.x[edges[:, 0]] - self.x[edges[:, 1]], self.y[edges[:, 0]] - self.y[edges[:, 1]])
+        edges = edges[np.argsort(lengths, kind='stable')].tolist()
+
+        # Union-find over the fragments, adjacent[node] holds the up to two fragment neighbors of a node
+        parent = list(range(n))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        adjacent = [[] for _ in range(n)]
+        for a, b in edges:
+            if len(adjacent[a]) < 2 and len(adjacent[b]) < 2:
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+                    adjacent[a].append(b)
+                    adjacent[b].append(a)
+
+        # Walk the fragments, each time continuing at the unvisited endpoint nearest to the end of the tour so far
+        endpoints = np.array([node for node in range(n) if len(adjacent[node]) < 2])
+        open_endpoints = np.ones(len(endpoints), dtype=bool)
+        endpoint_index = {node: i for i, node in enumerate(endpoints.tolist())}
+        tour = []
+        current = int(endpoints[0])
+        while True:
+            open_endpoints[endpoint_index[current]] = False
+            previous = -1
+            while True:
+                tour.append(current)
+                following = [node for node in adjacent[current] if node != previous]
+                if not following:
+                    break
+                previous, current = current, following[0]
+            open_endpoints[endpoint_index[current]] = False
+
+            candidates = endpoints[open_endpoints]
+            if len(candidates) == 0:
+                break
+            distances = np.hypot(self.x[candidates] - self.x[current], self.y[candidates] - self.y[current])
+            current = int(candidates[np.argmin(distances)])
+        return np.array(tour, dtype=np.int32)
+
+    def _hilbert_tour(self, order: int = 16) -> np.ndarray:
+        """
+        Order the nodes by their index on a Hilbert curve over a 2^order x 2^order grid covering the coordinates.
+        """
+        side = 1 << order
+        width = max(self.x.max() - self.x.min(), self.y.max() - self.y.min(), np.finfo(float).tiny)
+        x = np.minimum(((self.x - self.x.min()) / width * side).astype(np.int64), side - 1)
+        y = np.minimum(((self.y - self.y.min()) / width * side).astype(np.int64), side - 1)
+
+        index = np.zeros(len(x), dtype=np.int64)
+        s = side >> 1
+        while s > 0:
+            rx = (x & s) > 0
+            ry = (y & s) > 0
+            index += s * s * ((3 * rx) ^ ry)
+            # Rotate the quadrant so that the curve inside it has the standard orientation
+            flip = ~ry & rx
+            x = np.where(flip, side - 1 - x, x)
+            y = np.where(flip, side - 1 - y, y)
+            x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+            s >>= 1
+        return np.argsort(index, kind='stable').astype(np.int32)
+
+    def recommended_temperature(self, acceptance_probability: float = None, num_samples: int = 1000,
+                                seed: int = 0) -> float:
+        """
+        Recommend an initial temperature for annealing from the current tour.
+        The deltas are sampled from 2-opt moves between neighboring cities, as their scale is that of the
+        edges an anneal needs to improve, while random pairs mostly join far apart cities.
+        pre:
+        - acceptance_probability must be in (0, 1), None uses the value of INITIAL_TOUR_ACCEPTANCE for the
+          initial tour method, which is lower for constructed tours so that the anneal does not destroy them.
+        post:
+        - Returns the temperature at which the uphill moves among num_samples neighbor 2-opt moves are accepted
+          with a mean probability of acceptance_probability, see temperature_for_acceptance, or 1.0 if no move
+          is uphill.
+        """
+        if acceptance_probability is None:
+            acceptance_probability = INITIAL_TOUR_ACCEPTANCE[self.initial_tour]
+
+        deltas = self.sample_two_opt_deltas(num_samples, 'neighbor', seed)
+        return temperature_for_acceptance(deltas, acceptance_probability)
+
+    def sample_two_opt_deltas(self, num_samples: int, proposal: str = 'neighbor', seed: int = 0) -> np.ndarray:
+        """
+        Sample the deltas of random 2-opt moves on the current tour in one vectorized pass, without applying them.
+        pre:
+        - proposal must be 'neighbor', for the moves of neighbor_two_opt, or 'uniform', for moves between
+          uniformly drawn non-adjacent pairs like the Solver draws them.
+        post:
+        - Returns the float array of the deltas, with fewer than num_samples values for neighbor proposals,
+          as proposals without a valid move are dropped.
+        """
+        rng = np.random.default_rng(seed)
+        tour = self.tour
+        n = len(tour)
+        if proposal == 'neighbor':
+            cities = rng.integers(0, n, num_samples)
+            ranks = rng.integers(0, self.neighbors.shape[1], num_samples)
+            directions = rng.integers(0, 2, num_samples)
+
+            if self.linked is None:
+                position = self.position
+            else:
+                position = np.empty(n, dtype=np.int32)
+                position[tour] = np.arange(n, dtype=np.int32)
+            i, j = position[cities], position[self.neighbors[cities, ranks]]
+            i, j = np.minimum(i, j).astype(np.int64), np.maximum(i, j).astype(np.int64)
+            index1 = np.where(directions == 0, i + 1, i)
+            index2 = np.where(directions == 0, j, j - 1)
+            valid = (index2 - index1 >= 2) & (j - i != n - 1)
+            index1, index2 = index1[valid], index2[valid]
+        else:
+            first = rng.integers(0, n, num_samples)
+            second = (first + rng.integers(2, n - 1, num_samples)) % n
+            index1, index2 = np.minimum(first, second), np.maximum(first, second)
+
+        # The same edges and operations as two_opt_delta, for all samples at once
+        d = self.distance_matrix
+        before, first, last, after = tour[(index1 - 1) % n], tour[index1], tour[index2], tour[(index2 + 1) % n]
+        removed = d[before, first] + d[last, after]
+        added = d[before, last] + d[first, after]
+        return np.asarray(added - removed, dtype=float)
+
+    def node(self, index: int) -> Node:
+        """
+        Create a Node view of the city with the given node index.
+        """
+        return Node(int(index) + 1, float(self.x[index]), float(self.y[index]))
+
+    def nodes(self, tour: np.ndarray) -> List[Node]:
+        """
+        Convert an array of node indices to a list of Node views.
+        """
+        return [self.node(index) for index in tour]
+
+    @property
+    def tour_order(self) -> List[Node]:
+        """
+        The current tour as a list of Node views.
+        """
+        return self.nodes(self.tour)
+
+    @tour_order.setter
+    def tour_order(self, nodes: List[Node]):
+        self.tour = np.array([node.ID - 1 for node in nodes], dtype=np.int32)
+
+    @property
+    def tour_solution(self) -> List[Node]:
+        """
+        The optimal tour solution as a list of Node views, or None if the problem set has no optimal tour file.
+        """
+        if self.solution is None:
+            return None
+        return self.nodes(self.solution)
     
     def two_opt_swap(self, index1: int, index2: int):
         """
@@ -108,79 +541,295 @@ class Board:
         between index1 and index2. This eliminates edge crossings and potentially reduces the total distance.
         
         pre:
-        - index1 and index2 must be valid indices in the tour_order list.
+        - index1 and index2 must be valid indices in the tour array.
         - Nodes at index1 and index2 must not be adjacent or form a direct loop edge.
         post:
-        - The sub-tour between index1 and index2 is reversed (2-opt).
+        - The sub-tour between index1 and index2 is reversed in place (2-opt).
         - Raises ValueError if nodes are adjacent or form a direct loop edge.
         """
-        if abs(index1 - index2) == 1 or abs(index1 - index2) == len(self.tour_order) - 1:
+        if abs(index1 - index2) == 1 or abs(index1 - index2) == len(self.tour) - 1:
             raise ValueError('Nodes are adjacent or form a direct loop edge')
         
+        self.apply_move((TWO_OPT, index1, index2, 0))
+
+    def node_swap_delta(self, index1: int, index2: int) -> float:
+        """
+        Calculate the change in tour distance that exchanging the nodes at index1 and index2 would cause.
+        pre:
+        - index1 and index2 must be valid, non-adjacent indices in the tour array.
+        post:
+        - Returns the new tour distance minus the current tour distance, from the four edges at each node.
+        """
+        tour = self.tour
+        n = len(tour)
+        u, v = tour[index1], tour[index2]
+        before_u, after_u = tour[index1 - 1], tour[(index1 + 1) % n]
+        before_v, after_v = tour[index2 - 1], tour[(index2 + 1) % n]
+
+        d = self.distance_matrix
+        removed = d[before_u, u] + d[u, after_u] + d[before_v, v] + d[v, after_v]
+        added = d[before_u, v] + d[v, after_u] + d[before_v, u] + d[u, after_v]
+        return added - removed
+
+    def segment_insertion_delta(self, start: int, end: int, target: int, reverse: bool = False) -> float:
+        """
+        Calculate the change in tour distance that moving the segment start..end between the nodes at target
+        and target + 1 would cause, optionally reversing the segment. This is the 3-opt segment insertion move,
+        Or-opt is the special case of a segment of 1 to 3 nodes that keeps its orientation.
+        pre:
+        - 0 <= start <= end < len(tour) and the segment must leave at least two nodes outside of it.
+        - target must be an index outside of start - 1..end.
+        post:
+        - Returns the new tour distance minus the current tour distance, from the three removed and added edges.
+        """
+        tour = self.tour
+        n = len(tour)
+        before, first, last, after = tour[start - 1], tour[start], tour[end], tour[(end + 1) % n]
+        left, right = tour[target], tour[(target + 1) % n]
+        if reverse:
+            first, last = last, first
+
+        d = self.distance_matrix
+        removed = d[before, tour[start]] + d[tour[end], after] + d[left, right]
+        added = d[before, after] + d[left, first] + d[last, right]
+        return added - removed
+
+    def move_delta(self, move: tuple) -> float:
+        """
+        Calculate the change in tour distance of a move tuple (kind, a, b, c), where kind is TWO_OPT or NODE_SWAP
+        with the indices a and b, INSERTION or INSERTION_REVERSED of the segment a..b after the index c,
+        or NODE_TWO_OPT with the nodes a and b.
+        """
+        kind, a, b, c = move
+        if kind == NODE_TWO_OPT:
+            return self.node_two_opt_delta(a, b)
+        if kind == TWO_OPT:
+            return self.two_opt_delta(a, b)
+        if kind == NODE_SWAP:
+            return self.node_swap_delta(a, b)
+        return self.segment_insertion_delta(a, b, c, kind == INSERTION_REVERSED)
+
+    def apply_move(self, move: tuple):
+        """
+        Apply a move tuple to the tour in place and keep the position index up to date, see move_delta.
+        Raises ValueError if the move does not fit the tour backend, which is NODE_TWO_OPT for the two-level list
+        and all other kinds for the array.
+        """
+        if self.linked is not None:
+            if move[0] != NODE_TWO_OPT:
+                raise ValueError('The two-level list backend only supports node 2-opt moves')
+            self.linked.reverse(self.linked.next(move[1]), move[2])
+            return
+        if move[0] == NODE_TWO_OPT:
+            raise ValueError('Node 2-opt moves need the two-level list backend')
+
+        tour = self._tour
+        first, last = apply_move(tour, move)
+        if self._position is not None:
+            if first <= last:
+                self._position[tour[first:last + 1]] = np.arange(first, last + 1, dtype=np.int32)
+            else:
+                self._position[tour[first:]] = np.arange(first, len(tour), dtype=np.int32)
+                self._position[tour[:last + 1]] = np.arange(last + 1, dtype=np.int32)
+            self.start_index = int(self._position[0])
+        elif first <= self.start_index <= last:
+            self.start_index = first + int(np.argmax(tour[first:last + 1] == 0))
+        elif last < first and (self.start_index >= first or self.start_index <= last):
+            # The changed part wraps around the end of the array
+            tail = np.flatnonzero(tour[first:] == 0)
+            self.start_index = first + int(tail[0]) if len(tail) else int(np.argmax(tour[:last + 1] == 0))
+
+    def neighbor_two_opt(self, node: int, rank: int, direction: int):
+        """
+        Find the 2-opt move that makes a node adjacent to one of its nearest neighbors.
+        Direction 0 links the node to the neighbor and their successors to each other,
+        direction 1 links the node to the neighbor and their predecessors to each other.
+        pre:
+        - node must be a node index, rank an index into its candidate list and direction 0 or 1.
+        post:
+        - Returns the move tuple (TWO_OPT, index1, index2, 0), or (NODE_TWO_OPT, node1, node2, 0) with the
+          two-level list backend, or None if the two nodes are already adjacent or the move would reverse
+          only two nodes.
+        """
+        if self.linked is not None:
+            return self._neighbor_node_two_opt(node, int(self.neighbors[node, rank]), direction)
+
+        position = self.position
+        i, j = position[node], position[self.neighbors[node, rank]]
+        if i > j:
+            i, j = j, i
+
+        # The first and the last node of the array are adjacent as well, across the end of the tour
+        if j - i == len(position) - 1:
+            return None
+
+        if direction == 0:
+            index1, index2 = i + 1, j
+        else:
+            index1, index2 = i, j - 1
+        if index2 - index1 < 2:
+            return None
+        return TWO_OPT, int(index1), int(index2), 0
+
+    def _neighbor_node_two_opt(self, node: int, neighbor: int, direction: int):
+        """
+        neighbor_two_opt for the two-level list backend. Direction 1 is the move of direction 0
+        from the predecessors of the neighbor and the node.
+        """
+        linked = self.linked
+        if direction == 1:
+            node, neighbor = linked.prev(neighbor), linked.prev(node)
+        following = linked.next(node)
+        if following == neighbor or linked.next(following) == neighbor or linked.next(neighbor) == node:
+            return None
+        return NODE_TWO_OPT, node, neighbor, 0
+
+    def node_two_opt_delta(self, node1: int, node2: int) -> float:
+        """
+        Calculate the change in tour distance of the move (NODE_TWO_OPT, node1, node2, 0), which replaces the edges
+        from node1 and node2 to their successors by the edges node1 - node2 and successor - successor.
+        pre:
+        - The tour backend must be the two-level list and node1 and node2 different node indices.
+        post:
+        - Returns the new tour distance minus the current tour distance.
+        """
+        after1, after2 = self.linked.next(node1), self.linked.next(node2)
+        d = self.distance_matrix
+        return d[node1, node2] + d[after1, after2] - d[node1, after1] - d[node2, after2]
+
+    def two_opt_delta(self, index1: int, index2: int) -> float:
+        """
+        Calculate the change in tour distance that the 2-opt swap between index1 and index2 would cause,
+        without modifying the tour. Only the two removed and the two added edges are evaluated.
+        pre:
+        - index1 and index2 must be valid, non-adjacent indices in the tour array.
+        post:
+        - Returns the new tour distance minus the current tour distance.
+        """
         if index1 > index2:
             index1, index2 = index2, index1
-        
-        self.tour_order[index1:index2 + 1] = reversed(self.tour_order[index1:index2 + 1])
+
+        tour = self.tour
+        before = tour[index1 - 1]
+        first = tour[index1]
+        last = tour[index2]
+        after = tour[(index2 + 1) % len(tour)]
+
+        d = self.distance_matrix
+        removed = d[before, first] + d[last, after]
+        added = d[before, last] + d[first, after]
+        return added - removed
 
     def order_tour(self):
         """
-        Reorders the tour so that it starts with the node having ID 1.
+        Reorders the tour so that it starts with the node having ID 1, at the tracked start_index.
+        pre:
+        - Node with ID 1 (node index 0) must exist in the tour.
+        post:
+        - The tour is rotated to start with the node having ID 1. The two-level list backend has no start,
+          its tour array always starts with node index 0.
+        """
+        if self.linked is not None or self.start_index == 0:
+            return
+
+        start_index = self.start_index
+        self._tour = np.roll(self._tour, -start_index)
+        self.start_index = 0
+        if self._position is not None:
+            self._position -= start_index
+            self._position %= len(self._tour)
+
+    def _build_distance_matrix(self, path: str):
+        """
+        Build the n x n distance matrix between all nodes, indexed by node index, into a .npy file.
+        The matrix is computed and written in row blocks of about MATRIX_BLOCK_SIZE entries, so neither the matrix
+        nor the temporaries of computing it at once are held in memory.
         pre:
-        - Node with ID 1 must exist in the tour_order list.
+        - x and y must contain the coordinates read from the TSPLIB file.
         post:
-        - The tour_order list is rearranged to start with the node having ID 1.
+        - Writes the float distances of the edge weight type of the file if distance_metric is 'exact',
+          which for EUC_2D and CEIL_2D are the exact Euclidean distances.
+        - Writes the TSPLIB integer distances of the edge weight type as int32 if distance_metric is 'tsplib',
+          for EUC_2D nint(sqrt(dx^2 + dy^2)).
         """
-        start_index = next(i for i, node in enumerate(self.tour_order) if node.ID == 1)
-        self.tour_order = self.tour_order[start_index:] + self.tour_order[:start_index]
+        n = len(self.x)
+        rounded = self.distance_metric == 'tsplib'
+        dtype = np.dtype(np.int32 if rounded else np.float64)
+        nodes = np.arange(n)
+        block = max(1, MATRIX_BLOCK_SIZE // n)
+        with open(path, 'wb') as f:
+            np.lib.format.write_array_header_1_0(f, {
+                'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (n, n),
+            })
+            for start in range(0, n, block):
+                rows = nodes[start:start + block, None]
+                distances = tsplib.distances(self.x, self.y, rows, nodes[None, :], self.edge_weight_type, rounded)
+                f.write(np.ascontiguousarray(distances, dtype=dtype).tobytes())
 
-    def _distance(self, Node1: Node, Node2: Node) -> float:
+    def _on_the_fly_distances(self) -> tsplib.OnTheFlyDistances:
+        """
+        The stand-in for the distance matrix of large instances, with the distances of _build_distance_matrix.
         """
-        Calculate the Euclidean distance between two nodes.
+        return tsplib.OnTheFlyDistances(self.x, self.y, self.edge_weight_type, self.distance_metric == 'tsplib')
+
+    def _load_distance_matrix(self) -> np.ndarray:
+        """
+        Load the distance matrix from the on-disk cache, building and caching it on the first use.
+        The cache file is keyed by the name of the problem set, a hash of its TSPLIB file and the distance metric.
         pre:
-        - Node1 and Node2 must be valid Node instances.
+        - The nodes must be read.
         post:
-        - Returns the Euclidean distance between Node1 and Node2.
+        - Returns the distance matrix, memory-mapped read-only from TSP-Cache.
+        - Writes the cache file atomically, so concurrent runs never read a partial matrix.
+        """
+        path = os.path.join(CACHE_DIR, f'{self.name}-{self.digest}-{self.distance_metric}.npy')
+
+        if not os.path.exists(path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.npy')
+            os.close(fd)
+            self._build_distance_matrix(tmp_path)
+            os.replace(tmp_path, path)
+
+        # np.asarray drops the np.memmap subclass, whose Python-level __getitem__ slows down element access
+        return np.asarray(np.load(path, mmap_mode='r'))
+
+    def tour_length(self, tour: np.ndarray) -> float:
+        """
+        Calculate the total distance of a closed tour given as an array of node indices.
         """
-        x1, y1 = Node1.x, Node1.y
-        x2, y2 = Node2.x, Node2.y
-        distance = m.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-        distance_rounded = np.round(distance)
-        return distance
+        return float(self.distance_matrix[tour, np.roll(tour, -1)].sum())
 
     def calculate_tour_distance(self) -> float:
         """
         Calculate the total distance of the tour, forming a closed loop.
         pre:
-        - tour_order must contain a valid sequence of Node instances.
+        - tour must contain a valid permutation of node indices.
         post:
         - Returns the total distance of the tour as a float.
         """
-        return sum(
-            self._distance(self.tour_order[i], self.tour_order[(i + 1) % len(self.tour_order)])
-            for i in range(len(self.tour_order))
-        )
+        return self.tour_length(self.tour)
     
     def calculate_tour_solution_distance(self) -> float:
         """
         Calculate the total distance of the optimal tour solution, forming a closed loop.
         pre:
-        - tour_solution must contain a valid sequence of Node instances.
+        - solution must contain a valid permutation of node indices, or be None.
         post:
-        - Returns the total distance of the optimal tour solution as a float.
+        - Returns the total distance of the optimal tour solution as a float, or None if there is no solution.
         """
-        return sum(
-            self._distance(self.tour_solution[i], self.tour_solution[(i + 1) % len(self.tour_solution)])
-            for i in range(len(self.tour_solution))
-        )
+        if self.solution is None:
+            return None
+        return self.tour_length(self.solution)
 
     def __str__(self) -> str:
         """
         Represent the tour as a string.
         pre:
-        - tour_order must be a valid list of Node instances.
+        - tour must be a valid permutation of node indices.
         post:
         - Returns a string representation of the tour order and total distance.
         """
-        tour_order = ', '.join(str(node.ID) for node in self.tour_order)
+        tour_order = ', '.join(str(ID) for ID in self.tour + 1)
         tour_distance = self.calculate_tour_distance()
         return f'Tour order: {tour_order}\nTotal distance: {tour_distance}'
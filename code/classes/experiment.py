@@ -0,0 +1,129 @@
+from code.classes.board import Board
+from code.classes.solver import Solver
+from code.classes.shared import SharedInstance, attach
+from code.classes.schedules import CoolingSchedule
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Union
+import dataclasses
+import itertools
+import time
+import numpy as np
+import csv
+import os
+
+COOLING_METHODS = {
+    'exp': 'simulated_annealing_exp_cooling',
+    'log': 'simulated_annealing_log_cool',
+    'lin': 'simulated_annealing_lin_cool',
+}
+
+
+def parameter_grid(base, **axes) -> list:
+    """
+    Build the parameter sets of a grid sweep.
+    pre:
+    - base must be an AnnealingParameters instance, every keyword must be one of its fields with a list of values.
+    - base.folder_name may contain {field} placeholders, which are filled in with the values of each grid point.
+    post:
+    - Returns one AnnealingParameters per point of the cartesian product of the axes, in row-major order.
+    - NumPy scalars in the axes are converted to Python numbers, so the parameters stay JSON serializable.
+    """
+    names = list(axes)
+    grid = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        point = {name: value.item() if isinstance(value, np.generic) else value for name, value in zip(names, values)}
+        folder_name = base.folder_name.format(**point) if base.folder_name else base.folder_name
+        grid.append(dataclasses.replace(base, folder_name=folder_name, **point))
+    return grid
+
+
+def run_experiments(params_list: list, repetitions: int = 1, cooling: Union[str, CoolingSchedule] = 'exp',
+                    seed: int = None, max_workers: int = None) -> List[dict]:
+    """
+    Run every parameter set repetitions times across a pool of worker processes.
+    Every run gets its own seed, spawned from one numpy.random.SeedSequence, so the runs are independent of each
+    other and of the worker they execute on, and the whole experiment is reproducible for a given seed.
+    pre:
+    - params_list must be a list of AnnealingParameters, for example built with parameter_grid.
+    - cooling must be 'exp', 'log' or 'lin', or a picklable CoolingSchedule.
+    - seed seeds the SeedSequence, None draws fresh entropy.
+    post:
+    - Returns one summary dict per run, in the order of params_list and repetitions (see _run_single).
+    - With more than one repetition the output folder of repetition r is folder_name + f'_{r}'.
+    - Every problem set is loaded once in this process and shared with the workers through shared memory.
+    """
+    if isinstance(cooling, str) and cooling not in COOLING_METHODS:
+        raise ValueError(f'Invalid cooling: choose one of {", ".join(COOLING_METHODS)} or a CoolingSchedule')
+
+    seeds = np.random.SeedSequence(seed).spawn(len(params_list) * repetitions)
+    runs = []
+    for i, params in enumerate(params_list):
+        for repetition in range(repetitions):
+            folder_name = params.folder_name
+            if repetitions > 1 and folder_name is not None:
+                folder_name = f'{folder_name}_{repetition}'
+            run_seed = int(seeds[i * repetitions + repetition].generate_state(1)[0])
+            runs.append(dataclasses.replace(params, folder_name=folder_name, seed=run_seed))
+
+    instances = {}
+    try:
+        for params in runs:
+            key = (params.problem_set, params.distance_metric)
+            if key not in instances:
+                instances[key] = SharedInstance(Board(params))
+        specs = [instances[(params.problem_set, params.distance_metric)].spec for params in runs]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_run_single, runs, itertools.repeat(cooling), specs))
+    finally:
+        for instance in instances.values():
+            instance.close()
+
+
+def _run_single(params, cooling: Union[str, CoolingSchedule], spec: dict = None) -> dict:
+    """
+    Run one annealing run in a worker process and summarize it.
+    pre:
+    - spec optionally describes the shared instance data to attach to, see SharedInstance.
+    post:
+    - Returns a dict with the parameters of the run under 'parameters', the cooling, the final and the best recorded tour length,
+      the length of the optimal tour, the relative gap of the final length to it (None without an optimal tour),
+      and the elapsed seconds.
+    """
+    start_time = time.time()
+
+    solver = Solver(params, attach(spec) if spec is not None else None)
+    if isinstance(cooling, str):
+        getattr(solver, COOLING_METHODS[cooling])()
+    else:
+        solver.simulated_annealing(cooling)
+
+    final_length = solver.board.calculate_tour_distance()
+    optimal_length = solver.board.calculate_tour_solution_distance()
+    return {
+        'parameters': params,
+        'cooling': cooling if isinstance(cooling, str) else type(cooling).__name__,
+        'final_length': final_length,
+        'best_length': float(np.min(solver.all_lengths, initial=final_length)),
+        'optimal_length': optimal_length,
+        'gap': final_length / optimal_length - 1 if optimal_length is not None else None,
+        'elapsed_time': time.time() - start_time,
+    }
+
+
+def write_summary(results: List[dict], path: str):
+    """
+    Write the summaries of run_experiments to one CSV table, with a column per parameter and per result.
+    """
+    rows = []
+    for result in results:
+        row = dataclasses.asdict(result['parameters'])
+        row.update({key: value for key, value in result.items() if key != 'parameters'})
+        rows.append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Summary saved to: {os.path.abspath(path)}")
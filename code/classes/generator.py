@@ -0,0 +1,120 @@
+from code.classes import tsplib
+import argparse
+import re
+import os
+import numpy as np
+
+INSTANCE_KINDS = ('uniform', 'clustered', 'grid')
+SYNTHETIC_DIR = os.path.join(os.path.dirname(__file__), '../..', 'TSP-Cache', 'synthetic')
+
+# Side of the square the cities are placed in, as in the random instances of the DIMACS TSP challenge
+SIDE = 1_000_000
+CITIES_PER_CLUSTER = 100
+GRID_NOISE = 0.1
+
+_NAME = re.compile(rf'^({"|".join(INSTANCE_KINDS)})(\d+)-(\d+)$')
+
+
+def coordinates(kind: str, n: int, seed: int = 0) -> tuple:
+    """
+    Draw the coordinates of a synthetic instance of n cities in a SIDE x SIDE square.
+    - 'uniform': uniformly distributed cities.
+    - 'clustered': n / CITIES_PER_CLUSTER uniform centers, each city is drawn around a random center with a normal
+      offset of standard deviation SIDE / sqrt(n) per coordinate, as the clustered DIMACS instances.
+    - 'grid': the first n points of a square grid in row-major order, moved by a normal offset of GRID_NOISE times
+      the grid spacing.
+    pre:
+    - kind must be one of INSTANCE_KINDS and n at least 5.
+    post:
+    - Returns the x and y coordinates as float arrays, the same for the same kind, n and seed.
+    """
+    if kind not in INSTANCE_KINDS:
+        raise ValueError(f'Invalid instance kind: choose one of {", ".join(INSTANCE_KINDS)}')
+    if n < 5:
+        raise ValueError('A synthetic instance needs at least 5 cities')
+
+    rng = np.random.default_rng(seed)
+    if kind == 'uniform':
+        points = rng.uniform(0, SIDE, (n, 2))
+    elif kind == 'clustered':
+        centers = rng.uniform(0, SIDE, (max(1, n // CITIES_PER_CLUSTER), 2))
+        points = centers[rng.integers(0, len(centers), n)] + rng.normal(0, SIDE / np.sqrt(n), (n, 2))
+    else:
+        columns = int(np.ceil(np.sqrt(n)))
+        spacing = SIDE / columns
+        cells = np.arange(n)
+        points = (np.column_stack((cells % columns, cells // columns)) + 0.5) * spacing
+        points += rng.normal(0, GRID_NOISE * spacing, (n, 2))
+    return points[:, 0], points[:, 1]
+
+
+def instance_name(kind: str, n: int, seed: int = 0) -> str:
+    """
+    The name of a synthetic instance, which is also its problem set name, e.g. clustered10000-0.
+    """
+    return f'{kind}{n}-{seed}'
+
+
+def parse_name(name: str):
+    """
+    Return the (kind, n, seed) of a synthetic instance name, or None if name is not one.
+    """
+    match = _NAME.match(name) if isinstance(name, str) else None
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2)), int(match.group(3))
+
+
+def reference_tour(tsp_path: str) -> np.ndarray:
+    """
+    Build a reference tour for an instance without an optimal tour: the greedy edge tour, improved by the 2-opt
+    and Or-opt local search. It is typically 5 to 10 percent above the optimum and takes seconds for 100k cities.
+    post:
+    - Returns the tour as an int32 array of node indices, starting with node index 0.
+    """
+    from code.classes.board import Board, CACHE_DIR
+    from code.classes.local_search import LocalSearch
+    from code.classes.parser import AnnealingParameters
+
+    # Distances are computed on the fly, so no distance matrix is built or cached for the search
+    params = AnnealingParameters(problem_set=tsp_path, initial_tour='greedy', tour_backend='array')
+    instance = tsplib.load_instance(tsp_path, CACHE_DIR)
+    instance.update(problem_set=tsp_path, distance_metric=params.distance_metric, solution=None, distance_matrix=None)
+    board = Board(params, instance)
+    LocalSearch(board).optimize()
+    return board.tour
+
+
+def generate(kind: str, n: int, seed: int = 0, folder: str = SYNTHETIC_DIR, reference: bool = True) -> str:
+    """
+    Write a synthetic instance as a TSPLIB file, {name}.tsp in folder, see coordinates and instance_name.
+    With reference, a reference_tour is written next to it as {name}.opt.tour, in place of the unknown optimum,
+    so that the Board reports the gap to it like to the optimal tours of TSP-Configurations.
+    post:
+    - Returns the path of the TSPLIB file. Files that exist are kept, as they hold the same instance.
+    """
+    name = instance_name(kind, n, seed)
+    tsp_path = os.path.normpath(os.path.join(folder, f'{name}.tsp'))
+    if not os.path.isfile(tsp_path):
+        x, y = coordinates(kind, n, seed)
+        tsplib.write_instance(tsp_path, name, x, y, f'Synthetic {kind} instance of {n} cities, seed {seed}')
+
+    tour_path = os.path.join(os.path.dirname(tsp_path), f'{name}.opt.tour')
+    if reference and not os.path.isfile(tour_path):
+        tour = reference_tour(tsp_path)
+        tsplib.write_tour(tour_path, f'{name}.opt.tour', tour,
+                          f'Reference tour for {name}.tsp from greedy edge and 2-opt/Or-opt local search, not optimal')
+    return tsp_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic TSPLIB instances.')
+    parser.add_argument('kind', choices=INSTANCE_KINDS)
+    parser.add_argument('sizes', nargs='+', type=int, help='numbers of cities')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folder', default=SYNTHETIC_DIR, help='folder to write the instances to')
+    parser.add_argument('--no-reference', action='store_true', help='do not write a reference tour')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(generate(args.kind, size, args.seed, args.folder, not args.no_reference))
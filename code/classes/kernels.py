@@ -0,0 +1,193 @@
+from code.classes.board import TWO_OPT, NODE_SWAP, INSERTION_REVERSED
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+KERNELS = {'auto', 'numpy', 'numba'}
+
+
+def _jit(function):
+    """
+    Compile a function with Numba if it is installed, caching the machine code next to this module so that
+    only the first run pays the compile time. Without Numba the function stays plain Python.
+    """
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@_jit
+def _two_opt_delta(tour, d, index1, index2):
+    """
+    Board.two_opt_delta on the tour array, with the same floating point operations.
+    """
+    n = tour.shape[0]
+    if index1 > index2:
+        index1, index2 = index2, index1
+    before, first = tour[(index1 - 1) % n], tour[index1]
+    last, after = tour[index2], tour[(index2 + 1) % n]
+    removed = d[before, first] + d[last, after]
+    added = d[before, last] + d[first, after]
+    return added - removed
+
+
+@_jit
+def _node_swap_delta(tour, d, index1, index2):
+    """
+    Board.node_swap_delta on the tour array, with the same floating point operations.
+    """
+    n = tour.shape[0]
+    u, v = tour[index1], tour[index2]
+    before_u, after_u = tour[(index1 - 1) % n], tour[(index1 + 1) % n]
+    before_v, after_v = tour[(index2 - 1) % n], tour[(index2 + 1) % n]
+    removed = d[before_u, u] + d[u, after_u] + d[before_v, v] + d[v, after_v]
+    added = d[before_u, v] + d[v, after_u] + d[before_v, u] + d[u, after_v]
+    return added - removed
+
+
+@_jit
+def _segment_insertion_delta(tour, d, start, end, target, reverse):
+    """
+    Board.segment_insertion_delta on the tour array, with the same floating point operations.
+    """
+    n = tour.shape[0]
+    before, first, last, after = tour[(start - 1) % n], tour[start], tour[end], tour[(end + 1) % n]
+    left, right = tour[target], tour[(target + 1) % n]
+    if reverse:
+        first, last = last, first
+    removed = d[before, tour[start]] + d[tour[end], after] + d[left, right]
+    added = d[before, after] + d[left, first] + d[last, right]
+    return added - removed
+
+
+@_jit
+def _apply_move(tour, position, kind, a, b, c, start_index):
+    """
+    board.apply_move on the tour array, including the reversal of the shorter side of a 2-opt move,
+    followed by the update of the position index (if it is not empty) and of the index of node index 0.
+    Returns the new index of node index 0.
+    """
+    n = tour.shape[0]
+    if kind == TWO_OPT:
+        if a > b:
+            a, b = b, a
+        if 2 * (b - a + 1) <= n:
+            first, last = a, b
+            count = (b - a + 1) // 2
+        else:
+            # Reverse the rest of the tour, b + 1 .. a - 1 around the end of the array
+            first, last = b + 1, a - 1
+            count = (n - (b - a + 1)) // 2
+        i, j = first % n, last % n
+        for _ in range(count):
+            tour[i], tour[j] = tour[j], tour[i]
+            i = (i + 1) % n
+            j = (j - 1) % n
+    elif kind == NODE_SWAP:
+        tour[a], tour[b] = tour[b], tour[a]
+        first, last = min(a, b), max(a, b)
+    else:
+        length = b - a + 1
+        segment = tour[a:b + 1].copy()
+        if kind == INSERTION_REVERSED:
+            segment = segment[::-1].copy()
+        if c > b:
+            for i in range(a, c - length + 1):
+                tour[i] = tour[i + length]
+            tour[c - length + 1:c + 1] = segment
+            first, last = a, c
+        else:
+            for i in range(b, c + length, -1):
+                tour[i] = tour[i - length]
+            tour[c + 1:c + 1 + length] = segment
+            first, last = c + 1, b
+
+    # The changed part is first..last, or first..n - 1 and 0..last if it wraps around the end
+    if position.shape[0] > 0:
+        i = first % n
+        for _ in range((last - first) % n + 1):
+            position[tour[i]] = i
+            i = (i + 1) % n
+        return position[0]
+    if (first <= last and first <= start_index <= last) or \
+            (last < first and (start_index >= first or start_index <= last)):
+        i = first % n
+        while tour[i] != 0:
+            i = (i + 1) % n
+        return i
+    return start_index
+
+
+@_jit
+def anneal_chain(tour, position, d, kinds, a, b, c, thresholds, current_distance, start_index, max_accepted,
+                 lengths, deltas):
+    """
+    Run one Markov chain of drawn moves, the inner loop of Solver.simulated_annealing for uniform proposals.
+    pre:
+    - tour must be the array tour of the board, position its position index or an empty array if it has none,
+      d the distance matrix and start_index the index of node index 0 in the tour.
+    - kinds, a, b and c must hold the move tuples and thresholds the acceptance thresholds, see Solver._draw_moves.
+    post:
+    - The chain ends after max_accepted accepted moves or after all drawn moves.
+    - The accepted moves are applied to tour and position in place and lengths and deltas hold the tour length
+      and move delta after every step.
+    - Returns the tour length, the index of node index 0 and the number of steps at the end of the chain.
+    """
+    accepted = 0
+    steps = 0
+    while steps < kinds.shape[0] and accepted < max_accepted:
+        j = steps
+        kind = kinds[j]
+        if kind == TWO_OPT:
+            delta = _two_opt_delta(tour, d, a[j], b[j])
+        elif kind == NODE_SWAP:
+            delta = _node_swap_delta(tour, d, a[j], b[j])
+        else:
+            delta = _segment_insertion_delta(tour, d, a[j], b[j], c[j], kind == INSERTION_REVERSED)
+        if delta < thresholds[j]:
+            start_index = _apply_move(tour, position, kind, a[j], b[j], c[j], start_index)
+            current_distance += delta
+            accepted += 1
+        lengths[j] = current_distance
+        deltas[j] = delta
+        steps += 1
+    return current_distance, start_index, steps
+
+
+@_jit
+def anneal_neighbor_chain(tour, position, neighbors, d, cities, ranks, directions, thresholds, current_distance,
+                          max_accepted, lengths, deltas):
+    """
+    Run one Markov chain of neighbor proposals, see anneal_chain and Board.neighbor_two_opt.
+    pre:
+    - position must be the position index of the tour, which neighbor proposals need.
+    post:
+    - Returns the tour length, the index of node index 0 and the number of steps at the end of the chain.
+    """
+    accepted = 0
+    steps = 0
+    while steps < cities.shape[0] and accepted < max_accepted:
+        j = steps
+        i1, i2 = position[cities[j]], position[neighbors[cities[j], ranks[j]]]
+        if i1 > i2:
+            i1, i2 = i2, i1
+        if directions[j] == 0:
+            index1, index2 = i1 + 1, i2
+        else:
+            index1, index2 = i1, i2 - 1
+
+        # A proposal without a valid move, also for nodes adjacent across the end of the tour, counts as a rejected move
+        delta = 0.0
+        if index2 - index1 >= 2 and i2 - i1 != tour.shape[0] - 1:
+            delta = _two_opt_delta(tour, d, index1, index2)
+            if delta < thresholds[j]:
+                _apply_move(tour, position, TWO_OPT, index1, index2, 0, 0)
+                current_distance += delta
+                accepted += 1
+        lengths[j] = current_distance
+        deltas[j] = delta
+        steps += 1
+    return current_distance, position[0], steps
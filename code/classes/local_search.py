@@ -0,0 +1,158 @@
+from code.classes.board import Board, TWO_OPT, INSERTION, INSERTION_REVERSED
+from collections import deque
+import time
+import numpy as np
+
+IMPROVEMENT_TOLERANCE = 1e-9
+
+
+class LocalSearch:
+    def __init__(self, board, max_segment_length: int = 3):
+        """
+        Initialize a LocalSearch, a deterministic first-improvement 2-opt and Or-opt descent on the tour of a Board.
+        Only moves that add an edge between a city and one of its board.neighbors are tried, and cities whose
+        neighborhood has not changed since they last failed to improve are skipped (don't-look bits),
+        so a pass costs about n * num_neighbors move evaluations instead of n^2.
+        pre:
+        - board must be a Board with a valid tour.
+        - max_segment_length is the longest segment Or-opt moves, at least 1.
+        post:
+        - A LocalSearch instance is created that optimizes the board tour in place.
+        """
+        self.board = board
+        self.max_segment_length = max_segment_length
+        self.num_improvements = 0
+
+    def optimize(self) -> float:
+        """
+        Improve the tour until no 2-opt or Or-opt move between neighboring cities shortens it.
+        pre:
+        - The board tour must be a valid permutation of node indices.
+        post:
+        - The board tour is a local optimum of both neighborhoods, rotated to start with the node having ID 1.
+          A tour in the two-level list backend is searched as an array, as the moves are applied by index.
+        - self.num_improvements counts the applied moves. Returns the tour length.
+        """
+        board = self.board
+        n = len(board.tour)
+        if n < 5:
+            return board.calculate_tour_distance()
+
+        backend = board.tour_backend
+        board.set_tour_backend('array')
+
+        neighbors = board.neighbors.tolist()
+        queue = deque(board.tour.tolist())
+        active = np.ones(n, dtype=bool)
+
+        while queue:
+            city = queue.popleft()
+            active[city] = False
+
+            changed = self._improve_two_opt(city, neighbors) or self._improve_or_opt(city, neighbors)
+            if changed:
+                self.num_improvements += 1
+                for node in changed:
+                    if not active[node]:
+                        active[node] = True
+                        queue.append(node)
+
+        board.order_tour()
+        board.set_tour_backend(backend)
+        return board.calculate_tour_distance()
+
+    def _improve_two_opt(self, city: int, neighbors: list):
+        """
+        Try the 2-opt moves that make city adjacent to one of its neighbors, in both tour directions,
+        and apply the first improving one.
+        post:
+        - Returns the endpoints of the changed edges if a move was applied, else None.
+        """
+        board = self.board
+        tour, position, d = board.tour, board.position, board.distance_matrix
+        n = len(tour)
+        i = position[city]
+
+        for successor_side in (True, False):
+            other = tour[(i + 1) % n] if successor_side else tour[i - 1]
+            current = d[city, other]
+            for neighbor in neighbors[city]:
+                gain = current - d[city, neighbor]
+                if gain <= IMPROVEMENT_TOLERANCE:
+                    break
+
+                j = position[neighbor]
+                neighbor_other = tour[(j + 1) % n] if successor_side else tour[j - 1]
+                if neighbor_other == city:
+                    continue
+                delta = d[other, neighbor_other] - d[neighbor, neighbor_other] - gain
+                if delta >= -IMPROVEMENT_TOLERANCE:
+                    continue
+
+                # Reverse the path between the two new edges
+                if successor_side:
+                    first, last = (i + 1, j) if i < j else (j + 1, i)
+                else:
+                    first, last = (i, j - 1) if i < j else (j, i - 1)
+                board.apply_move((TWO_OPT, int(first), int(last), 0))
+                return city, other, neighbor, neighbor_other
+        return None
+
+    def _improve_or_opt(self, city: int, neighbors: list):
+        """
+        Try to move the segments of 1 to max_segment_length cities that start at city next to a neighbor of one
+        of their ends, in either orientation, and apply the first improving move.
+        post:
+        - Returns the endpoints of the changed edges if a move was applied, else None.
+        """
+        board = self.board
+        tour, position, d = board.tour, board.position, board.distance_matrix
+        n = len(tour)
+        start = int(position[city])
+
+        for length in range(1, self.max_segment_length + 1):
+            end = start + length - 1
+            if end >= n or length > n - 3:
+                break
+
+            before, first, last, after = tour[start - 1], tour[start], tour[end], tour[(end + 1) % n]
+            removal_gain = d[before, first] + d[last, after] - d[before, after]
+            if removal_gain <= IMPROVEMENT_TOLERANCE:
+                continue
+
+            for endpoint in (first, last):
+                for neighbor in neighbors[endpoint]:
+                    if removal_gain - d[endpoint, neighbor] <= IMPROVEMENT_TOLERANCE:
+                        break
+                    j = position[neighbor]
+                    if start <= j <= end:
+                        continue
+
+                    # Insert on either side of the neighbor, target is the index of the left node of the edge
+                    for target in (j, (j - 1) % n):
+                        if start - 1 <= target <= end or target == (start - 1) % n:
+                            continue
+                        for kind in (INSERTION, INSERTION_REVERSED):
+                            move = (kind, start, end, int(target))
+                            if board.move_delta(move) < -IMPROVEMENT_TOLERANCE:
+                                left, right = tour[target], tour[(target + 1) % n]
+                                board.apply_move(move)
+                                return before, after, first, last, left, right
+        return None
+
+
+def local_search(params) -> LocalSearch:
+    """
+    Solve a problem set with the local search alone, from the initial tour of the Board, as a fast baseline.
+    post:
+    - Returns the LocalSearch, its board holds the locally optimal tour.
+    """
+    print('=============Local Search started=============')
+    start_time = time.time()
+
+    search = LocalSearch(Board(params))
+    search.optimize()
+
+    print(f"Local search took {time.time() - start_time:.2f} seconds and {search.num_improvements} moves.")
+    print(search.board)
+    return search
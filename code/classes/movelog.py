@@ -0,0 +1,56 @@
+import numpy as np
+from code.classes.board import apply_move
+
+
+class MoveLog:
+    def __init__(self, initial_tour: np.ndarray, move_steps: np.ndarray, moves: np.ndarray,
+                 keyframe_steps: np.ndarray, keyframes: np.ndarray, num_steps: int, keyframe_starts: np.ndarray):
+        """
+        Initialize a MoveLog, a compact trajectory made of the initial tour, the accepted moves
+        with the step at which they were accepted, and periodic keyframe tours for seeking.
+        The moves are applied as in the solver, with board.apply_move on a tour that is only rotated
+        to start with node index 0 when it is returned.
+        pre:
+        - initial_tour must be the tour before step 0, starting with node index 0.
+        - move_steps must be increasing and moves must hold the (kind, a, b, c) tuple of every move.
+        - keyframes must hold the tour after each step in keyframe_steps, starting with node index 0,
+          and keyframe_starts the index of node index 0 in the unrotated tour of the solver at that step.
+        post:
+        - A MoveLog instance is created that reconstructs the tour after any step.
+        """
+        self.initial_tour = initial_tour
+        self.move_steps = move_steps
+        self.moves = moves
+        self.keyframe_steps = keyframe_steps
+        self.keyframes = keyframes
+        self.num_steps = num_steps
+        self.keyframe_starts = keyframe_starts
+
+        self._cursor_step = -1
+        self._cursor_tour = initial_tour.copy()
+
+    def tour_at(self, step: int) -> np.ndarray:
+        """
+        Reconstruct the tour after the given step.
+        pre:
+        - 0 <= step < num_steps.
+        post:
+        - Returns a new array with the tour, rebuilt from the nearest keyframe at or before step
+          (or the cached position of the previous call, if that is closer) by replaying the moves.
+        """
+        keyframe = np.searchsorted(self.keyframe_steps, step, side='right') - 1
+        base_step = self.keyframe_steps[keyframe] if keyframe >= 0 else -1
+
+        if base_step <= self._cursor_step <= step:
+            base_step, tour = self._cursor_step, self._cursor_tour
+        elif keyframe >= 0:
+            tour = np.roll(self.keyframes[keyframe], int(self.keyframe_starts[keyframe]))
+        else:
+            tour = self.initial_tour.copy()
+
+        first, last = np.searchsorted(self.move_steps, [base_step + 1, step + 1])
+        for move in np.asarray(self.moves[first:last]).tolist():
+            apply_move(tour, move)
+
+        self._cursor_step, self._cursor_tour = step, tour
+        return np.roll(tour, -int(np.argmax(tour == 0)))
@@ -6,9 +6,29 @@ class AnnealingParameters:
     Data class to store the parameters.
     """
     problem_set: str = None
-    save_data: bool = None                 # Saves data as csv file and saves the plots if True
+    save_data: bool = None                 # Saves data to the output folder and saves the plots if True
     folder_name: str = None
     initial_temperature: float = None
     cooling_rate: float = None
     markov_chain_length: int = None
-    num_markov_chains: int = None
\ No newline at end of file
+    num_markov_chains: int = None
+    distance_metric: str = 'exact'         # 'exact' float distances or 'tsplib' nint (EUC_2D) distances
+    record_policy: str = 'chain'           # Tour snapshots: 'none', 'every', 'chain', 'improvement', 'reservoir', 'ring' or 'movelog'
+    record_interval: int = 1               # Steps between snapshots for the 'every' policy
+    record_buffer_size: int = 1000         # Number of snapshots kept by the 'reservoir' and 'ring' policies
+    keyframe_interval: int = 10000         # Steps between keyframe tours for the 'movelog' policy
+    chunk_size: int = 65536                # Values per chunk streamed to the output folder when save_data is True
+    beta: float = 10                       # Cooling constant of the logarithmic schedule
+    seed: int = None                       # Seed of the random number generator, None draws a fresh seed
+    proposal: str = 'uniform'              # 2-opt proposals: 'uniform' pairs or 'neighbor' (a city and one of its nearest neighbors)
+    num_neighbors: int = 10                # Length of the nearest-neighbor candidate list of every city
+    moves: dict = None                     # Mixture of move types and their weights, e.g. {'two_opt': 0.6, 'or_opt': 0.4}; None is 2-opt only
+    polish: bool = False                   # Runs the 2-opt/Or-opt local search on the final tour of the anneal
+    initial_tour: str = 'file'             # Initial tour: 'file' order, 'nearest_neighbor', 'greedy' or 'hilbert'
+    tour_backend: str = 'auto'             # Tour storage: 'array', 'two_level' list, or 'auto' (array)
+    kernel: str = 'auto'                   # Markov chain loop: 'numpy', 'numba' (compiled) or 'auto' (numba if installed)
+    accepted_moves_per_chain: int = None   # Ends a Markov chain after this many accepted moves, markov_chain_length is the cap; None runs full chains
+    patience: int = None                   # Stops the run after this many Markov chains without a new best tour length; None runs the whole schedule
+    initial_acceptance: float = None       # Derives initial_temperature so that this share of sampled uphill 2-opt moves is accepted, e.g. 0.8
+    final_acceptance: float = None         # Fits the cooling parameter so that the last Markov chain accepts this share of them, e.g. 0.001
+    num_temperature_samples: int = 10000   # Number of 2-opt deltas sampled for initial_acceptance and final_acceptance
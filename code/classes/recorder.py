@@ -0,0 +1,394 @@
+import os
+import dataclasses
+import numpy as np
+from code.classes.movelog import MoveLog
+from code.classes.storage import RunWriter, load_run
+
+RECORD_POLICIES = {'none', 'every', 'chain', 'improvement', 'reservoir', 'ring', 'movelog'}
+PER_STEP_POLICIES = {'every', 'improvement', 'reservoir', 'ring', 'movelog'}
+SLOT_POLICIES = {'reservoir', 'ring'}
+
+
+def _copy_rotated(destination: np.ndarray, tour: np.ndarray, start: int):
+    """
+    Copy a tour into destination, rotated so that the node at index start comes first.
+    """
+    n = len(tour)
+    destination[:n - start] = tour[start:]
+    destination[n - start:] = tour[:start]
+
+
+class _Column:
+    def __init__(self, name: str, capacity: int, row_shape: tuple, dtype, writer: RunWriter = None):
+        """
+        Initialize an append-only column buffer. When the buffer is full it is handed to the writer
+        and reused if the run is streamed to disk, otherwise it doubles in size.
+        """
+        self.name = name
+        self.writer = writer
+        self.data = np.empty((max(capacity, 1),) + row_shape, dtype=dtype)
+        self.size = 0
+
+    def append(self, row):
+        """
+        Append one row to the column.
+        """
+        self._reserve()
+        self.data[self.size] = row
+        self.size += 1
+
+    def append_rotated(self, tour: np.ndarray, start: int):
+        """
+        Append a tour to a column of tours, rotated so that the node at index start comes first.
+        """
+        self._reserve()
+        _copy_rotated(self.data[self.size], tour, start)
+        self.size += 1
+
+    def _reserve(self):
+        """
+        Make room for one more row.
+        """
+        if self.size == len(self.data):
+            if self.writer is not None:
+                self.flush()
+            else:
+                self.data = np.resize(self.data, (2 * len(self.data),) + self.data.shape[1:])
+
+    def extend(self, rows: np.ndarray):
+        """
+        Append several rows to the column.
+        """
+        if self.writer is None:
+            end = self.size + len(rows)
+            if end > len(self.data):
+                self.data = np.resize(self.data, (max(end, 2 * len(self.data)),) + self.data.shape[1:])
+            self.data[self.size:end] = rows
+            self.size = end
+            return
+
+        while len(rows):
+            if self.size == len(self.data):
+                self.flush()
+            count = min(len(rows), len(self.data) - self.size)
+            self.data[self.size:self.size + count] = rows[:count]
+            self.size += count
+            rows = rows[count:]
+
+    def flush(self):
+        """
+        Hand the buffered rows to the writer.
+        """
+        if self.size:
+            self.writer.append(self.name, self.data[:self.size].copy())
+            self.size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        The rows of an in-memory column.
+        """
+        return self.data[:self.size]
+
+
+class Recorder:
+    def __init__(self, params, n: int):
+        """
+        Initialize a Recorder that stores the trajectory of an annealing run with bounded memory.
+        The scalar series (tour length, temperature and acceptance probability) are kept for every step.
+        Tour snapshots are kept according to params.record_policy, rotated to start with node index 0
+        as they are copied, so the solver does not need to keep its tour canonical:
+        - 'none': no snapshots, only the final tour.
+        - 'every': every params.record_interval steps.
+        - 'chain': at the end of every Markov chain.
+        - 'improvement': whenever the tour length improves on the best length so far.
+        - 'reservoir': a uniform random sample of params.record_buffer_size steps (reservoir sampling).
+        - 'ring': the last params.record_buffer_size steps (ring buffer).
+        - 'movelog': the initial tour, every accepted move and a keyframe tour every
+          params.keyframe_interval steps, from which a MoveLog reconstructs the tour at any step.
+        If params.save_data is True the data is streamed to the output folder during the run in chunks of
+        params.chunk_size values, so memory stays flat, otherwise it is kept in preallocated arrays.
+        pre:
+        - params must include markov_chain_length, num_markov_chains, save_data, folder_name
+          and the recording options.
+        - n must be the number of nodes in the tour.
+        post:
+        - A Recorder instance is created with empty in-memory buffers, start() prepares every run.
+        - Raises ValueError for an unknown record policy or a non-positive interval, buffer or chunk size.
+        """
+        self.p = params
+        self.n = n
+        self.policy = params.record_policy
+        if self.policy not in RECORD_POLICIES:
+            raise ValueError(f'Invalid record policy: choose one of {", ".join(sorted(RECORD_POLICIES))}')
+
+        self.chain_length = params.markov_chain_length
+        self.interval = params.record_interval
+        self.buffer_size = params.record_buffer_size
+        self.keyframe_interval = params.keyframe_interval
+        self.chunk_size = params.chunk_size
+        if min(self.interval, self.buffer_size, self.keyframe_interval, self.chunk_size) < 1:
+            raise ValueError('record_interval, record_buffer_size, keyframe_interval and chunk_size must be positive')
+
+        self.total_steps = params.num_markov_chains * params.markov_chain_length
+        self.folder_path = os.path.abspath(os.path.join("output", params.folder_name)) if params.save_data else None
+        self.writer = None
+        self.streamed = False
+        self._run = None
+        self._allocate(np.arange(n, dtype=np.int32), stream=False)
+
+    def start(self, tour: np.ndarray):
+        """
+        Prepare the recording of a run, before its first step.
+        pre:
+        - tour must be the tour the run starts from, which is the base of the move log.
+        post:
+        - The buffers of a previous run are discarded and, if the data is saved, the output folder is opened.
+        """
+        self._allocate(tour, stream=self.folder_path is not None)
+
+    def _allocate(self, tour: np.ndarray, stream: bool):
+        """
+        Allocate the buffers, sized to a chunk when the data is streamed to a RunWriter.
+        """
+        n = self.n
+        self.streamed = stream
+        if stream:
+            self.writer = RunWriter(self.folder_path, dataclasses.asdict(self.p), {
+                'lengths': (np.float64, ()),
+                'temperatures': (np.float64, ()),
+                'acceptance_probs': (np.float64, ()),
+                'tours': (np.int32, (n,)),
+                'tour_steps': (np.int64, ()),
+                'final_tour': (np.int32, ()),
+                'move_initial_tour': (np.int32, ()),
+                'move_steps': (np.int64, ()),
+                'moves': (np.int32, (4,)),
+                'keyframe_starts': (np.int64, ()),
+            })
+        self._run = None
+
+        series_capacity = min(self.chunk_size, self.total_steps) if stream else self.total_steps
+        self.lengths = _Column('lengths', series_capacity, (), np.float64, self.writer)
+        self.temperatures = _Column('temperatures', series_capacity, (), np.float64, self.writer)
+        self.acceptance_probs = _Column('acceptance_probs', series_capacity, (), np.float64, self.writer)
+        self.num_steps = 0
+
+        capacity = {
+            'none': 0,
+            'every': self.total_steps // self.interval,
+            'chain': self.total_steps // self.chain_length,
+            'improvement': 64,
+            'reservoir': min(self.buffer_size, self.total_steps),
+            'ring': min(self.buffer_size, self.total_steps),
+            'movelog': self.total_steps // self.keyframe_interval,
+        }[self.policy]
+        if stream and self.policy not in SLOT_POLICIES:
+            capacity = min(capacity, max(1, self.chunk_size // n))
+        self._tours = _Column('tours', capacity, (n,), np.int32, self.writer)
+        self._tour_steps = _Column('tour_steps', capacity, (), np.int64, self.writer)
+        self._keyframe_starts = _Column('keyframe_starts', capacity, (), np.int64, self.writer)
+        self._best_length = np.inf
+
+        self._rng = np.random.default_rng(0)
+        self._reservoir_weight = 1.0
+        self._reservoir_next = 0
+
+        self._initial_tour = tour.copy()
+        move_capacity = max(1, self.chunk_size // 5) if stream else 1024
+        self._move_steps = _Column('move_steps', move_capacity, (), np.int64, self.writer)
+        self._moves = _Column('moves', move_capacity, (4,), np.int32, self.writer)
+
+        self.final_tour = None
+
+    def record_step(self, step: int, tour: np.ndarray, length: float, move: tuple = None, start: int = 0):
+        """
+        Record the tour after one annealing step, for the policies in PER_STEP_POLICIES.
+        pre:
+        - step must be the index of the step, counted from 0 and increasing by one per call.
+        - tour must be the current tour as an array of node indices and length its length.
+        - move must be the move tuple (see Board.move_delta) if the step accepted one, else None.
+        - start must be the index of node index 0 in tour.
+        post:
+        - A copy of the tour, rotated to start with node index 0, is stored if the policy selects this step.
+        - The accepted move is appended to the move log for the 'movelog' policy. Moves refer to the indices
+          of the unrotated tour, so the keyframes also record their start.
+        """
+        policy = self.policy
+        if policy == 'every':
+            if (step + 1) % self.interval == 0:
+                self._append(step, tour, start)
+        elif policy == 'improvement':
+            if length < self._best_length:
+                self._best_length = length
+                self._append(step, tour, start)
+        elif policy == 'ring':
+            self._store(step % len(self._tours.data), step, tour, start)
+        elif policy == 'reservoir':
+            self._sample(step, tour, start)
+        elif policy == 'movelog':
+            if move is not None:
+                self._move_steps.append(step)
+                self._moves.append(move)
+            if (step + 1) % self.keyframe_interval == 0:
+                self._append(step, tour, start)
+                self._keyframe_starts.append(start)
+
+    def record_chain(self, lengths: np.ndarray, temperature: float, acceptance_probs: np.ndarray, tour: np.ndarray,
+                     start: int = 0):
+        """
+        Record the scalar series of one Markov chain at once.
+        pre:
+        - lengths and acceptance_probs must hold the value after every step of the chain.
+        - tour must be the tour at the end of the chain and start the index of node index 0 in it.
+        post:
+        - The series are extended and, for the 'chain' policy, a rotated copy of the tour is stored.
+        """
+        self.lengths.extend(lengths)
+        self.temperatures.extend(np.full(len(lengths), temperature))
+        self.acceptance_probs.extend(acceptance_probs)
+        self.num_steps += len(lengths)
+
+        if self.policy == 'chain':
+            self._append(self.num_steps - 1, tour, start)
+
+    def _append(self, step: int, tour: np.ndarray, start: int):
+        """
+        Append a tour snapshot.
+        """
+        self._tours.append_rotated(tour, start)
+        self._tour_steps.append(step)
+
+    def _store(self, slot: int, step: int, tour: np.ndarray, start: int):
+        """
+        Copy a tour into a fixed snapshot slot of the 'reservoir' and 'ring' policies.
+        """
+        _copy_rotated(self._tours.data[slot], tour, start)
+        self._tour_steps.data[slot] = step
+        self._tours.size = self._tour_steps.size = max(self._tours.size, slot + 1)
+
+    def _sample(self, step: int, tour: np.ndarray, start: int):
+        """
+        Reservoir sampling with geometric skips (Li's Algorithm L), so that random numbers are
+        only drawn for the steps that actually enter the reservoir.
+        """
+        size = len(self._tours.data)
+        if step < size:
+            self._store(step, step, tour, start)
+            if step == size - 1:
+                self._advance_reservoir(step)
+        elif step == self._reservoir_next:
+            self._store(int(self._rng.integers(size)), step, tour, start)
+            self._advance_reservoir(step)
+
+    def _advance_reservoir(self, step: int):
+        """
+        Draw the step at which the next tour replaces a random reservoir slot.
+        """
+        size = len(self._tours.data)
+        self._reservoir_weight *= np.exp(np.log(self._rng.random()) / size)
+        skip = np.floor(np.log(self._rng.random()) / np.log1p(-self._reservoir_weight))
+        self._reservoir_next = step + int(skip) + 1
+
+    def _sorted_slots(self):
+        """
+        The tours and steps of the 'reservoir' and 'ring' slots, ordered by step.
+        """
+        order = np.argsort(self._tour_steps.values, kind='stable')
+        return self._tours.values[order], self._tour_steps.values[order]
+
+    def finish(self, tour: np.ndarray):
+        """
+        Store the final tour of the run.
+        """
+        self.final_tour = tour.copy()
+
+    def save(self):
+        """
+        Write the data that is still buffered and close the output folder of a streamed run.
+        pre:
+        - finish() must have been called and params.save_data must be True.
+        post:
+        - The folder holds the complete run, readable with load_run.
+        """
+        if self.policy in SLOT_POLICIES:
+            tours, steps = self._sorted_slots()
+            self._tours.size = self._tour_steps.size = 0
+            self.writer.append('tours', tours)
+            self.writer.append('tour_steps', steps)
+        for column in (self.lengths, self.temperatures, self.acceptance_probs,
+                       self._tours, self._tour_steps, self._move_steps, self._moves, self._keyframe_starts):
+            column.flush()
+        self.writer.append('final_tour', self.final_tour)
+        if self.policy == 'movelog':
+            self.writer.append('move_initial_tour', self._initial_tour)
+        self.writer.close()
+        self.writer = None
+
+    def _saved_run(self) -> dict:
+        """
+        The data of a streamed run read back from the output folder, cached once the run is complete.
+        """
+        if self._run is not None:
+            return self._run
+        run = load_run(self.folder_path)
+        if run['metadata']['complete']:
+            self._run = run
+        return run
+
+    def _series(self, name: str) -> np.ndarray:
+        """
+        One of the scalar series, read back from the output folder for a streamed run.
+        """
+        if self.streamed:
+            return self._saved_run()[name]
+        return getattr(self, name).values
+
+    @property
+    def all_lengths(self) -> np.ndarray:
+        return self._series('lengths')
+
+    @property
+    def all_temperatures(self) -> np.ndarray:
+        return self._series('temperatures')
+
+    @property
+    def all_acceptance_probs(self) -> np.ndarray:
+        return self._series('acceptance_probs')
+
+    @property
+    def move_log(self):
+        """
+        The MoveLog of the run for the 'movelog' policy, None for the other policies.
+        """
+        if self.policy != 'movelog':
+            return None
+        if self.streamed:
+            return self._saved_run()['move_log']
+        return MoveLog(
+            self._initial_tour, self._move_steps.values, self._moves.values,
+            self.tour_steps, self.tours, self.num_steps, self._keyframe_starts.values,
+        )
+
+    @property
+    def tours(self) -> np.ndarray:
+        """
+        The recorded tour snapshots as an (m, n) int32 array, ordered by step.
+        For the 'movelog' policy these are the keyframes.
+        """
+        if self.streamed:
+            return self._saved_run()['tours']
+        if self.policy in SLOT_POLICIES:
+            return self._sorted_slots()[0]
+        return self._tours.values
+
+    @property
+    def tour_steps(self) -> np.ndarray:
+        """
+        The step index of every recorded tour snapshot, in increasing order.
+        """
+        if self.streamed:
+            return self._saved_run()['tour_steps']
+        if self.policy in SLOT_POLICIES:
+            return self._sorted_slots()[1]
+        return self._tour_steps.values
@@ -0,0 +1,143 @@
+from code.classes.board import Board
+from code.classes.schedules import CoolingSchedule
+from code.classes.solver import fit_temperatures
+import time
+import numpy as np
+import os
+
+
+class ReplicaSolver:
+    def __init__(self, params, num_replicas: int):
+        """
+        Initialize a ReplicaSolver that advances num_replicas independent annealing chains in lockstep.
+        The tours are held as a (num_replicas, n) int32 array and every step proposes one 2-opt move per replica,
+        evaluates all deltas with fancy indexing into the distance matrix and applies the accepted reversals at once,
+        so the interpreter overhead of a step is shared by all replicas.
+        pre:
+        - params must include attributes for the problem set, initial temperature, markov chain length,
+          number of markov chains, seed and save_data option.
+        - num_replicas must be a positive integer.
+        post:
+        - A ReplicaSolver instance is created with every replica starting from the initial tour of the Board.
+        """
+        if num_replicas < 1:
+            raise ValueError('num_replicas must be positive')
+
+        self.board = Board(params)
+        self.p = params
+        self.num_replicas = num_replicas
+
+        self.board.order_tour()
+        self.tours = np.tile(self.board.tour, (num_replicas, 1))
+        self.lengths = np.full(num_replicas, self.board.calculate_tour_distance())
+
+        self.best_tours = self.tours.copy()
+        self.best_lengths = self.lengths.copy()
+        self.chain_lengths = np.empty((0, num_replicas))
+        self.acceptance_rates = np.empty((0, num_replicas))
+
+    def simulated_annealing(self, schedule: CoolingSchedule):
+        """
+        Perform simulated annealing with the 2-opt swap on all replicas at once.
+        The random numbers are drawn per Markov chain for all replicas from a numpy.random.Generator seeded with
+        self.p.seed, with the same rejection-free pair sampling and threshold test as Solver.
+        pre:
+        - schedule must be a CoolingSchedule, all replicas share its temperatures. The initial temperature and the
+          acceptance targets are resolved as in Solver, see fit_temperatures.
+        post:
+        - self.tours and self.lengths hold the final tour and length of every replica, canonically rotated.
+        - self.best_tours and self.best_lengths hold the best tour and length every replica has visited.
+        - self.chain_lengths and self.acceptance_rates hold, per Markov chain and replica, the length at the end
+          of the chain and the fraction of accepted moves, shaped (num_markov_chains, num_replicas).
+        - Optionally saves the per-replica results to the output folder.
+        """
+        print('=====Replica Simulated Annealing started======')
+
+        start_time = time.time()
+
+        rng = np.random.default_rng(self.p.seed)
+        initial_temperature, schedule = fit_temperatures(self.p, self.board, schedule, 'uniform')
+        temperatures = schedule.temperatures(initial_temperature, self.p.num_markov_chains)
+        d = self.board.distance_matrix
+        k, n = self.tours.shape
+        chain_length = self.p.markov_chain_length
+        replicas = np.arange(k)
+        positions = np.arange(n)
+
+        self.chain_lengths = np.empty((len(temperatures), k))
+        self.acceptance_rates = np.empty((len(temperatures), k))
+
+        for i, temperature in enumerate(temperatures):
+            first = rng.integers(0, n, (chain_length, k))
+            second = (first + rng.integers(2, n - 1, (chain_length, k))) % n
+            first_indices, second_indices = np.minimum(first, second), np.maximum(first, second)
+            thresholds = -temperature * np.log(rng.random((chain_length, k)))
+            accepted_moves = np.zeros(k, dtype=np.int64)
+
+            for j in range(chain_length):
+                index1, index2 = first_indices[j], second_indices[j]
+
+                before = self.tours[replicas, index1 - 1]
+                first_node = self.tours[replicas, index1]
+                last = self.tours[replicas, index2]
+                after = self.tours[replicas, (index2 + 1) % n]
+                delta = d[before, last] + d[first_node, after] - d[before, first_node] - d[last, after]
+
+                accepted = np.flatnonzero(delta < thresholds[j])
+                if len(accepted) == 0:
+                    continue
+
+                # Reverse the segment of every accepted replica by gathering through mirrored positions
+                low, high = index1[accepted, None], index2[accepted, None]
+                inside = (positions >= low) & (positions <= high)
+                source = np.where(inside, low + high - positions, positions)
+                self.tours[accepted] = np.take_along_axis(self.tours[accepted], source, axis=1)
+                self.lengths[accepted] += delta[accepted]
+                accepted_moves[accepted] += 1
+
+                improved = accepted[self.lengths[accepted] < self.best_lengths[accepted]]
+                if len(improved):
+                    self.best_lengths[improved] = self.lengths[improved]
+                    self.best_tours[improved] = self.tours[improved]
+
+            self.chain_lengths[i] = self.lengths
+            self.acceptance_rates[i] = accepted_moves / chain_length
+
+        self.tours = self._canonical(self.tours)
+        self.best_tours = self._canonical(self.best_tours)
+
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        print(f"Simulation took {elapsed_time:.2f} seconds.")
+
+        print("=====Replica Simulated Annealing finished=====")
+        print(f"Best distance per replica: {np.round(self.best_lengths, 2)}")
+        print(f"Best distance overall: {self.best_lengths.min()}")
+
+        if self.p.save_data:
+            self._save_data()
+
+    def _canonical(self, tours: np.ndarray) -> np.ndarray:
+        """
+        Rotate every tour so that it starts with the node having ID 1.
+        """
+        n = tours.shape[1]
+        starts = np.argmax(tours == 0, axis=1)
+        return np.take_along_axis(tours, (starts[:, None] + np.arange(n)) % n, axis=1)
+
+    def _save_data(self):
+        """
+        Save the per-replica results to replicas.npz in the output folder if save_data is True.
+        """
+        if not self.p.save_data:
+            return
+
+        folder_path = os.path.abspath(os.path.join("output", self.p.folder_name))
+        os.makedirs(folder_path, exist_ok=True)
+        np.savez(
+            os.path.join(folder_path, "replicas.npz"),
+            final_tours=self.tours, final_lengths=self.lengths,
+            best_tours=self.best_tours, best_lengths=self.best_lengths,
+            chain_lengths=self.chain_lengths, acceptance_rates=self.acceptance_rates,
+        )
+        print(f"Data saved to folder: {folder_path}")
@@ -0,0 +1,147 @@
+import abc
+import numpy as np
+from typing import Callable, Sequence, Union
+
+
+class CoolingSchedule(abc.ABC):
+    """
+    Base class of the cooling schedules. A schedule computes the temperature of every Markov chain
+    up front as a NumPy array, so the annealing engine does not evaluate it inside the loop.
+    """
+    @abc.abstractmethod
+    def temperatures(self, initial_temperature: float, num_markov_chains: int) -> np.ndarray:
+        """
+        Compute the temperature of every Markov chain.
+        pre:
+        - initial_temperature must be positive and num_markov_chains must be non-negative.
+        post:
+        - Returns a float array of length num_markov_chains.
+        """
+
+    def with_final_temperature(self, initial_temperature: float, final_temperature: float,
+                               num_markov_chains: int) -> 'CoolingSchedule':
+        """
+        Fit the cooling parameter of the schedule so that the last Markov chain runs at final_temperature.
+        pre:
+        - 0 < final_temperature < initial_temperature and num_markov_chains must be at least 2.
+        post:
+        - Returns a new schedule of the same kind.
+        """
+        raise ValueError(f'{type(self).__name__} has no cooling parameter to fit a final temperature')
+
+
+class ExponentialCooling(CoolingSchedule):
+    def __init__(self, cooling_rate: float):
+        """
+        Exponential cooling, T_i = T_0 * cooling_rate^(i + 1): the temperature is already lowered
+        once before the first chain.
+        """
+        self.cooling_rate = cooling_rate
+
+    def temperatures(self, initial_temperature: float, num_markov_chains: int) -> np.ndarray:
+        factors = np.full(num_markov_chains, self.cooling_rate, dtype=float)
+        if num_markov_chains:
+            factors[0] *= initial_temperature
+        return np.cumprod(factors)
+
+    def with_final_temperature(self, initial_temperature, final_temperature, num_markov_chains):
+        _check_final_temperature(initial_temperature, final_temperature, num_markov_chains)
+        return ExponentialCooling((final_temperature / initial_temperature) ** (1 / num_markov_chains))
+
+
+class LogarithmicCooling(CoolingSchedule):
+    def __init__(self, beta: float = 10):
+        """
+        Logarithmic cooling, T_i = T_0 / (1 + beta * ln(1 + i)).
+        """
+        self.beta = beta
+
+    def temperatures(self, initial_temperature: float, num_markov_chains: int) -> np.ndarray:
+        return initial_temperature / (1 + self.beta * np.log(1 + np.arange(num_markov_chains)))
+
+    def with_final_temperature(self, initial_temperature, final_temperature, num_markov_chains):
+        _check_final_temperature(initial_temperature, final_temperature, num_markov_chains)
+        return LogarithmicCooling((initial_temperature / final_temperature - 1) / np.log(num_markov_chains))
+
+
+class LinearCooling(CoolingSchedule):
+    def __init__(self, cooling_rate: float, minimum_temperature: float = 0.1):
+        """
+        Linear cooling, T_i = max(minimum_temperature, T_0 - cooling_rate * i).
+        """
+        self.cooling_rate = cooling_rate
+        self.minimum_temperature = minimum_temperature
+
+    def temperatures(self, initial_temperature: float, num_markov_chains: int) -> np.ndarray:
+        return np.maximum(
+            self.minimum_temperature,
+            initial_temperature - self.cooling_rate * np.arange(num_markov_chains),
+        )
+
+    def with_final_temperature(self, initial_temperature, final_temperature, num_markov_chains):
+        _check_final_temperature(initial_temperature, final_temperature, num_markov_chains)
+        return LinearCooling(
+            (initial_temperature - final_temperature) / (num_markov_chains - 1),
+            min(self.minimum_temperature, final_temperature),
+        )
+
+
+class CustomCooling(CoolingSchedule):
+    def __init__(self, schedule: Union[Callable[[float, np.ndarray], np.ndarray], Sequence[float]]):
+        """
+        User-supplied cooling, given either as a function of the initial temperature and the array of
+        chain indices that returns the temperatures, or as a sequence of temperatures, one per chain.
+        """
+        self.schedule = schedule
+
+    def temperatures(self, initial_temperature: float, num_markov_chains: int) -> np.ndarray:
+        if callable(self.schedule):
+            temperatures = self.schedule(initial_temperature, np.arange(num_markov_chains))
+        else:
+            temperatures = self.schedule
+        temperatures = np.asarray(temperatures, dtype=float)
+
+        if temperatures.shape != (num_markov_chains,):
+            raise ValueError('A custom schedule must give one temperature per Markov chain')
+        if np.any(temperatures <= 0):
+            raise ValueError('Temperatures must be positive')
+        return temperatures
+
+
+def _check_final_temperature(initial_temperature: float, final_temperature: float, num_markov_chains: int):
+    """
+    Check the arguments of CoolingSchedule.with_final_temperature.
+    """
+    if not 0 < final_temperature < initial_temperature:
+        raise ValueError('The final temperature must be positive and below the initial temperature')
+    if num_markov_chains < 2:
+        raise ValueError('Fitting a final temperature needs at least 2 Markov chains')
+
+
+def temperature_for_acceptance(deltas: np.ndarray, acceptance: float) -> float:
+    """
+    Find the temperature T at which the uphill moves among the sampled deltas are accepted with the given
+    mean probability, mean(exp(-delta / T)) = acceptance, so that a schedule can be given by acceptance ratios.
+    The mean is increasing in T and lies between exp(-mean_delta / T) (by Jensen's inequality) and
+    exp(-min_delta / T), which bound the temperature, and T is found by bisection on log T between these bounds.
+    pre:
+    - acceptance must be in (0, 1).
+    post:
+    - Returns the temperature, or 1.0 if no delta is uphill.
+    """
+    if not 0 < acceptance < 1:
+        raise ValueError('The acceptance ratio must be in (0, 1)')
+    uphill = np.asarray(deltas, dtype=float)
+    uphill = uphill[uphill > 0]
+    if len(uphill) == 0:
+        return 1.0
+
+    log_acceptance = np.log(acceptance)
+    low, high = np.log(-uphill.min() / log_acceptance), np.log(-uphill.mean() / log_acceptance)
+    for _ in range(60):
+        middle = (low + high) / 2
+        if np.mean(np.exp(-uphill / np.exp(middle))) < acceptance:
+            low = middle
+        else:
+            high = middle
+    return float(np.exp((low + high) / 2))
@@ -0,0 +1,78 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+INSTANCE_ARRAYS = ('file_tour', 'x', 'y', 'solution', 'distance_matrix')
+
+# Attachments of the current process, keyed by the name of the shared memory block,
+# so that a worker maps every instance only once however many runs it executes
+_attached = {}
+
+
+class SharedInstance:
+    def __init__(self, board):
+        """
+        Initialize a SharedInstance that publishes the instance data of a Board through shared memory,
+        so that worker processes can attach zero-copy views instead of parsing and building it themselves.
+        pre:
+        - board must be a Board that has read its problem set.
+        post:
+        - The tour in file order, the coordinates, the optimal solution (if any) and the distance matrix of the board
+          are copied into one shared memory block per array, owned by this process until close() is called.
+        - self.spec is a small picklable description of the blocks to hand to attach().
+        """
+        self.blocks = []
+        arrays = {}
+        for name in INSTANCE_ARRAYS:
+            # A missing solution or the on-the-fly distances of a large instance are not shared
+            if not isinstance(getattr(board, name), np.ndarray):
+                continue
+            values = np.ascontiguousarray(getattr(board, name))
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            self.blocks.append(block)
+            arrays[name] = (block.name, values.dtype.str, values.shape)
+
+        self.spec = {
+            'problem_set': board.problem_set,
+            'distance_metric': board.distance_metric,
+            'edge_weight_type': board.edge_weight_type,
+            'digest': board.digest,
+            'arrays': arrays,
+        }
+
+    def close(self):
+        """
+        Release and remove the shared memory blocks. Workers must be done with the instance.
+        """
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(spec: dict) -> dict:
+    """
+    Attach to an instance published by a SharedInstance.
+    pre:
+    - spec must be the spec of a SharedInstance that has not been closed yet.
+    post:
+    - Returns a dict with the problem set, the distance metric, the edge weight type, the file digest and every array
+      of INSTANCE_ARRAYS as a read-only NumPy view of the shared memory (None for a missing solution or
+      distance matrix),
+      which the Board constructor accepts as instance.
+    """
+    instance = {key: value for key, value in spec.items() if key != 'arrays'}
+    instance.update({name: None for name in INSTANCE_ARRAYS})
+    for name, (block_name, dtype, shape) in spec['arrays'].items():
+        if block_name not in _attached:
+            _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[block_name].buf)
+        view.flags.writeable = False
+        instance[name] = view
+    return instance
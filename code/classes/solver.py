@@ -1,163 +1,298 @@
-from code.classes.board import Board
+from code.classes.board import Board, TWO_OPT, NODE_SWAP, INSERTION, INSERTION_REVERSED, NODE_TWO_OPT
+from code.classes.recorder import Recorder, PER_STEP_POLICIES
+from code.classes.local_search import LocalSearch
+from code.classes import kernels
+from code.classes.schedules import CoolingSchedule, ExponentialCooling, LogarithmicCooling, LinearCooling, \
+    temperature_for_acceptance
 import time
 import numpy as np
-import csv
-import os
+
+PROPOSALS = {'uniform', 'neighbor'}
+MOVE_TYPES = ('two_opt', 'or_opt', 'node_swap', 'segment_insertion')
 
 class Solver:
-    def __init__(self, params):
+    def __init__(self, params, instance: dict = None):
         """
         Initialize a Solver instance with the provided parameters.
         pre:
         - params must include attributes for the problem set, initial temperature, cooling rate, 
           markov chain length, number of markov chains, and save_data option.
+        - instance optionally holds shared instance data for the Board, see shared.attach.
         post:
-        - A Solver instance is created with the given parameters and an initialized Board.
+        - A Solver instance is created with the given parameters, an initialized Board and a Recorder
+          that stores the trajectory according to params.record_policy.
         """
-        self.board = Board(params)
+        if params.proposal not in PROPOSALS:
+            raise ValueError('Invalid proposal: choose uniform or neighbor')
+        if (params.accepted_moves_per_chain is not None and params.accepted_moves_per_chain < 1) or \
+                (params.patience is not None and params.patience < 1):
+            raise ValueError('accepted_moves_per_chain and patience must be positive')
+        if params.initial_acceptance is not None and params.initial_temperature is not None:
+            raise ValueError('Give either initial_temperature or initial_acceptance')
+        self.stop_reason = None
+        self.initial_temperature = None
+        self.final_temperature = None
+
+        # Probabilities of the move types in MOVE_TYPES order, None when only 2-opt moves are used
+        self.move_probabilities = None
+        if params.moves is not None:
+            if not set(params.moves) <= set(MOVE_TYPES):
+                raise ValueError(f'Invalid move type: choose from {", ".join(MOVE_TYPES)}')
+            weights = np.array([params.moves.get(move_type, 0) for move_type in MOVE_TYPES], dtype=float)
+            if np.any(weights < 0) or weights.sum() <= 0:
+                raise ValueError('Move weights must be non-negative and not all zero')
+            if weights[1:].any():
+                self.move_probabilities = weights / weights.sum()
+        if self.move_probabilities is not None and params.proposal == 'neighbor':
+            raise ValueError('Neighbor proposals only support 2-opt moves')
+
+        self.board = Board(params, instance)
+        if self.board.linked is not None:
+            if self.move_probabilities is not None:
+                raise ValueError('The two-level list tour backend only supports 2-opt moves')
+            if params.record_policy == 'movelog':
+                raise ValueError('The movelog record policy needs the array tour backend')
         self.p = params
-
-        self.all_tours = []
-        self.all_lengths = []
-        self.all_temperatures = []
-        self.all_acceptance_probs = []
+        self.recorder = Recorder(params, len(self.board.tour))
+
+        # The compiled kernel runs whole Markov chains on the tour array and the distance matrix,
+        # so it cannot record every step or work on the two-level list or on-the-fly distances
+        if params.kernel not in kernels.KERNELS:
+            raise ValueError(f'Invalid kernel: choose one of {", ".join(sorted(kernels.KERNELS))}')
+        kernel_supported = self.board.linked is None and isinstance(self.board.distance_matrix, np.ndarray) \
+            and params.record_policy not in PER_STEP_POLICIES
+        if params.kernel == 'numba' and not (kernels.NUMBA_AVAILABLE and kernel_supported):
+            raise ValueError('The numba kernel needs Numba, the array tour backend, a distance matrix '
+                             'and a record policy that does not record every step')
+        self.use_kernel = params.kernel != 'numpy' and kernels.NUMBA_AVAILABLE and kernel_supported
+
+    @property
+    def all_tours(self):
+        return self.recorder.tours
+
+    @property
+    def tour_steps(self):
+        return self.recorder.tour_steps
+
+    @property
+    def move_log(self):
+        return self.recorder.move_log
+
+    @property
+    def final_tour(self):
+        return self.recorder.final_tour
+
+    @property
+    def all_lengths(self):
+        return self.recorder.all_lengths
+
+    @property
+    def all_temperatures(self):
+        return self.recorder.all_temperatures
+
+    @property
+    def all_acceptance_probs(self):
+        return self.recorder.all_acceptance_probs
 
     def _give_answer(self):
         """
         Check if the current tour matches the optimal solution and print the result.
         pre:
-        - self.board.tour_order must contain a valid tour of Node objects.
+        - self.board.tour must contain a valid permutation of node indices.
         - self.board.tour_solution must be the correct optimal solution.
         post:
         - Prints whether the tour is correct and displays the current tour and its length.
         """
-        tour = [node.ID for node in self.board.tour_order]
+        if self.board.solution is None:
+            print("The problem set has no optimal tour to compare with.")
+            return
+
+        tour = (self.board.tour + 1).tolist()
+        solution = (self.board.solution + 1).tolist()
 
-        if tour != self.board.tour_solution:
+        if tour != solution:
             print("The tour is not correct.")
-            print(f"Expected: {self.board.tour_solution}")
-            print(f"Got: {tour}")
+            print(f"Expected: {solution} (length {self.board.calculate_tour_solution_distance()})")
+            print(f"Got: {tour} (length {self.board.calculate_tour_distance()})")
         else:
             print("The tour is correct.")
             print(f"Tour: {tour}")
             print(f"Tour length: {self.board.calculate_tour_distance()}")
 
-    def simulated_annealing_exp_cooling(self):
+    def _draw_chain(self, rng: np.random.Generator, n: int, length: int, temperature: float):
         """
-        Perform simulated annealing to solve the travelling salesman problem.
-        pre:
-        - self.p must include valid attributes for initial_temperature, cooling_rate, 
-          markov_chain_length, num_markov_chains, and save_data options.
-        - Board instance must be initialized with a valid tour and nodes.
+        Draw the moves of a whole Markov chain with _draw_moves.
         post:
-        - Performs simulated annealing to find an optimized tour.
-        - Saves intermediate states for visualization and optionally saves results to CSV files.
+        - Returns the move tuples and the acceptance thresholds as lists.
         """
-        print('=========Simulated Annealing started==========')
-
-        start_time = time.time() 
-
-        current_distance = self.board.calculate_tour_distance()
-        temperature = self.p.initial_temperature
-
-        for i in range(self.p.num_markov_chains):
-            temperature = temperature * self.p.cooling_rate
+        kinds, a, b, c, thresholds = self._draw_moves(rng, n, length, temperature)
+        return list(zip(kinds.tolist(), a.tolist(), b.tolist(), c.tolist())), thresholds.tolist()
 
-            for j in range(self.p.markov_chain_length):
-                previous_tour = self.board.tour_order[:]
-
-                index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-                while index1 == index2 or abs(index1 - index2) == 1 or abs(index1 - index2) == len(self.board.tour_order) - 1:
-                    index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-
-                self.board.two_opt_swap(index1, index2)
-                new_distance = self.board.calculate_tour_distance()
-                delta = new_distance - current_distance
-                acceptance_prob = np.exp(-delta / temperature) if delta > 0 else 1
-
-                if delta < 0:
-                    current_distance = new_distance
-                else:
-                    if np.random.rand() < acceptance_prob: 
-                        current_distance = new_distance
-                    else:
-                        self.board.tour_order = previous_tour[:]
-
-                self.board.order_tour()
-                self.all_tours.append(self.board.tour_order[:])
-                self.all_lengths.append(current_distance)
-                self.all_temperatures.append(temperature)
-                self.all_acceptance_probs.append(acceptance_prob)
-
-        self.board.order_tour()
-
-        end_time = time.time() 
-        elapsed_time = end_time - start_time
-        print(f"Simulation took {elapsed_time:.2f} seconds.")
-
-
-        print("=========Simulated Annealing finished=========")
-        print(self.board)
+    def _draw_moves(self, rng: np.random.Generator, n: int, length: int, temperature: float):
+        """
+        Draw the random numbers of a whole Markov chain at once.
+        A non-adjacent pair is drawn without rejection as a random position plus a cyclic offset in [2, n - 2],
+        which reaches every unordered non-adjacent pair from both of its ends and so samples them uniformly.
+        The Metropolis test u < exp(-delta / T) is rewritten as delta < -T * ln(u), so each step compares the delta
+        with a precomputed threshold instead of calling exp.
+        With a mixture of move types, the type of every step is drawn from self.move_probabilities, node swaps use
+        the pair like 2-opt, and segment insertions draw a segment, of 1 to 3 nodes for Or-opt and up to half the tour
+        otherwise (reversed with probability 1/2), and a uniform target outside of it.
+        The array backend gets pairs of tour indices. The two-level list backend has no indices and gets the drawn
+        pair as the node indices of a NODE_TWO_OPT move instead, unordered and regardless of self.p.moves. That move
+        replaces the edges from both nodes to their successors, so the pair picks two distinct tour edges; the nodes
+        are non-adjacent as indices, not in the tour, and the rare pairs of adjacent tour edges give a move that
+        leaves the tour unchanged.
+        pre:
+        - n must be at least 4, so that non-adjacent pairs exist.
+        post:
+        - Returns the columns kinds, a, b and c of the move tuples (see Board.move_delta), with a < b for the index
+          pairs of the array backend, and the acceptance thresholds as arrays.
+        """
+        first = rng.integers(0, n, length)
+        second = (first + rng.integers(2, n - 1, length)) % n
+        thresholds = -temperature * np.log(rng.random(length))
+        index1, index2 = np.minimum(first, second), np.maximum(first, second)
+
+        zeros = np.zeros(length, dtype=np.int64)
+        if self.board.linked is not None:
+            return np.full(length, NODE_TWO_OPT), first, second, zeros, thresholds
+        if self.move_probabilities is None:
+            return zeros, index1, index2, zeros, thresholds
+
+        types = rng.choice(len(MOVE_TYPES), size=length, p=self.move_probabilities)
+        segment_lengths = np.where(
+            types == MOVE_TYPES.index('or_opt'), rng.integers(1, 4, length), rng.integers(1, n // 2 + 1, length),
+        )
+        segment_lengths = np.minimum(segment_lengths, n - 3)
+        starts = rng.integers(0, n - segment_lengths + 1)
+        ends = starts + segment_lengths - 1
+        targets = (ends + 1 + rng.integers(0, n - segment_lengths - 1)) % n
+        reverse = (types == MOVE_TYPES.index('segment_insertion')) & (rng.random(length) < 0.5)
+
+        kinds = np.choose(types, [TWO_OPT, INSERTION, NODE_SWAP, INSERTION])
+        kinds[reverse] = INSERTION_REVERSED
+        pairs = kinds <= NODE_SWAP
+        return kinds, np.where(pairs, index1, starts), np.where(pairs, index2, ends), np.where(pairs, 0, targets), \
+            thresholds
+
+    def _draw_neighbor_chain(self, rng: np.random.Generator, n: int, length: int, temperature: float):
+        """
+        Draw the proposals of a whole Markov chain with _draw_neighbor_proposals.
+        post:
+        - Returns the (city, rank, direction) proposals and the acceptance thresholds as lists.
+        """
+        cities, ranks, directions, thresholds = self._draw_neighbor_proposals(rng, n, length, temperature)
+        return list(zip(cities.tolist(), ranks.tolist(), directions.tolist())), thresholds.tolist()
 
-        if self.p.save_data:
-            self._save_data()
+    def _draw_neighbor_proposals(self, rng: np.random.Generator, n: int, length: int, temperature: float):
+        """
+        Draw the random numbers of a whole Markov chain of neighbor proposals at once: a city, the rank
+        of one of its candidate neighbors and the direction of the move (see Board.neighbor_two_opt).
+        The positions of the move depend on the tour at that step, so they are looked up in the loop.
+        post:
+        - Returns the cities, ranks and directions and the acceptance thresholds as arrays.
+        """
+        cities = rng.integers(0, n, length)
+        ranks = rng.integers(0, self.board.neighbors.shape[1], length)
+        directions = rng.integers(0, 2, length)
+        thresholds = -temperature * np.log(rng.random(length))
+        return cities, ranks, directions, thresholds
 
-    def simulated_annealing_log_cool(self):
+    def simulated_annealing(self, schedule: CoolingSchedule):
         """
-        Perform simulated annealing to solve the travelling salesman problem using the 2-opt swap.
+        Perform simulated annealing with the 2-opt swap, or a mixture of move types, to solve the travelling salesman problem.
+        This is the single annealing engine, the cooling schedule only provides the temperature of each Markov chain.
+        The random numbers are drawn per Markov chain from a numpy.random.Generator seeded with self.p.seed,
+        so a run is reproducible for a given seed.
+        With self.p.proposal 'neighbor' every move links a random city to one of its nearest neighbors,
+        which are far more likely to be accepted at low temperatures than uniformly drawn pairs.
         pre:
-        - self.p must include valid attributes for initial_temperature, cooling_rate, 
-        markov_chain_length, num_markov_chains, and save_data options.
+        - self.p must include valid attributes for initial_temperature, markov_chain_length,
+          num_markov_chains, seed, and save_data options. An initial_temperature of None uses
+          board.recommended_temperature() for the initial tour, unless it is derived from initial_acceptance.
         - Board instance must be initialized with a valid tour and nodes.
+        - schedule must be a CoolingSchedule.
         post:
         - Performs simulated annealing to find an optimized tour.
-        - Saves intermediate states for visualization and optionally saves results to CSV files.
+        - With self.p.initial_acceptance and self.p.final_acceptance the initial temperature and the temperature
+          of the last Markov chain are those at which the given shares of uphill moves are accepted, estimated from
+          num_temperature_samples 2-opt deltas sampled on the initial tour with the proposal of the run, see
+          schedules.temperature_for_acceptance. For a final temperature the cooling parameter of the schedule is
+          fitted, see CoolingSchedule.with_final_temperature. The temperatures are kept in self.initial_temperature
+          and self.final_temperature.
+        - With self.p.polish the final tour is improved further by a LocalSearch, after the recorded steps.
+        - Saves intermediate states for visualization and optionally saves results to the output folder.
+        - The tour is not rotated back to node index 0 after every move, board.start_index tracks the rotation and
+          the snapshots are rotated as they are recorded. The final board tour starts with node index 0.
+        - If self.use_kernel, the Markov chains run in the compiled kernel, with the same random numbers
+          and results as the Python loop.
+        - With self.p.accepted_moves_per_chain a Markov chain ends after that many accepted moves, or after
+          markov_chain_length steps, so the chains are short while most moves are accepted and grow as the
+          acceptance rate drops.
+        - With self.p.patience the run stops once that many Markov chains in a row did not improve on the
+          best tour length. self.stop_reason is 'frozen' if the tour length did not change at all in those
+          chains, 'no_improvement' if it still changed, and 'schedule' if every chain of the schedule ran.
         """
         print('=========Simulated Annealing started==========')
 
         start_time = time.time()
 
+        rng = np.random.default_rng(self.p.seed)
+        schedule = self._fit_temperatures(schedule)
+        temperatures = schedule.temperatures(self.initial_temperature, self.p.num_markov_chains)
+        self.final_temperature = float(temperatures[-1]) if len(temperatures) else self.initial_temperature
         current_distance = self.board.calculate_tour_distance()
-
-        initial_temperature = self.p.initial_temperature
-
-        for i in range(self.p.num_markov_chains):
-            temperature = self.logarithmic_cooling(initial_temperature, 10, i)
-
-            for j in range(self.p.markov_chain_length):
-                previous_tour = self.board.tour_order[:]
-
-                # Select two non-adjacent cities (index1, index2) for the 2-opt swap
-                index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-                while index1 == index2 or abs(index1 - index2) == 1 or abs(index1 - index2) == len(self.board.tour_order) - 1:
-                    index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-
-                # Perform the 2-opt swap between the selected cities
-                self.board.two_opt_swap(index1, index2)
-                new_distance = self.board.calculate_tour_distance()
-                delta = new_distance - current_distance
-                acceptance_prob = np.exp(-delta / temperature) if delta > 0 else 1
-
-                if delta < 0:
-                    current_distance = new_distance
-                else:
-                    if np.random.rand() < acceptance_prob:
-                        current_distance = new_distance
-                    else:
-                        self.board.tour_order = previous_tour[:]
-
-                # Save current state for visualization
-                self.board.order_tour()
-                self.all_tours.append(self.board.tour_order[:])
-                self.all_lengths.append(current_distance)
-                self.all_temperatures.append(temperature)
-                self.all_acceptance_probs.append(acceptance_prob)
+        chain_length = self.p.markov_chain_length
+        best_distance = current_distance
+        stalled_chains = 0
+        frozen_chains = 0
+        self.stop_reason = 'schedule'
+        step = 0
+        self.board.order_tour()
+        self.recorder.start(self.board.tour)
+
+        lengths = np.empty(chain_length)
+        deltas = np.empty(chain_length)
+        num_chains = 0
+        for temperature in temperatures:
+            num_chains += 1
+            chain_start_distance = current_distance
+            current_distance, steps = self.run_chain(rng, temperature, current_distance, lengths, deltas, step)
+            step += steps
+
+            # Save the chain for visualization, the acceptance probabilities are computed for the whole chain at once
+            acceptance_probs = np.exp(-np.maximum(deltas[:steps], 0) / temperature)
+            self.recorder.record_chain(
+                lengths[:steps], temperature, acceptance_probs, self.board.tour, self.board.start_index,
+            )
+
+            # A chain improves if its shortest tour beats the best one by more than the rounding error of the
+            # tracked length, it is frozen if it accepted no move that changed the tour length
+            chain_best = lengths[:steps].min()
+            if chain_best < best_distance - 1e-9 * abs(best_distance):
+                best_distance = chain_best
+                stalled_chains = 0
+            else:
+                stalled_chains += 1
+            frozen_chains = frozen_chains + 1 if np.all(lengths[:steps] == chain_start_distance) else 0
+            if self.p.patience is not None and stalled_chains >= self.p.patience:
+                self.stop_reason = 'frozen' if frozen_chains >= self.p.patience else 'no_improvement'
+                break
+
+        if self.p.polish:
+            search = LocalSearch(self.board)
+            search.optimize()
+            print(f"Local search polish applied {search.num_improvements} moves.")
 
         self.board.order_tour()
+        self.recorder.finish(self.board.tour)
 
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Simulation took {elapsed_time:.2f} seconds.")
+        if self.stop_reason != 'schedule':
+            print(f"Stopped early ({self.stop_reason}) after {num_chains} Markov chains and {step} steps.")
 
         print("=========Simulated Annealing finished=========")
         print(self.board)
@@ -165,130 +300,157 @@ class Solver:
         if self.p.save_data:
             self._save_data()
 
-    def simulated_annealing_lin_cool(self):
+    def run_chain(self, rng: np.random.Generator, temperature: float, current_distance: float,
+                  lengths: np.ndarray, deltas: np.ndarray, step: int = 0) -> tuple:
         """
-        Perform simulated annealing to solve the travelling salesman problem using the 2-opt swap.
+        Run one Markov chain of up to len(lengths) steps at temperature on the board, with the proposals of
+        self.p.proposal and self.p.moves, in the compiled kernel if self.use_kernel and in the Python loop otherwise.
+        With self.p.accepted_moves_per_chain the chain ends after that many accepted moves.
         pre:
-        - self.p must include valid attributes for initial_temperature, cooling_rate, 
-        markov_chain_length, num_markov_chains, and save_data options.
-        - Board instance must be initialized with a valid tour and nodes.
+        - current_distance is the length of the board tour, step the number of steps before the chain, which
+          numbers the steps the recorder records.
         post:
-        - Performs simulated annealing to find an optimized tour.
-        - Saves intermediate states for visualization and optionally saves results to CSV files.
+        - The board tour is updated, lengths and deltas are filled for the steps of the chain and a per-step
+          record policy has recorded every step.
+        - Returns the tour length and the number of steps at the end of the chain.
         """
-        print('=========Simulated Annealing started==========')
-
-        start_time = time.time()
-
-        current_distance = self.board.calculate_tour_distance()
-
-        initial_temperature = self.p.initial_temperature
-
-        for i in range(self.p.num_markov_chains):
-            temperature = self.linear_cooling(initial_temperature,self.p.cooling_rate, i)
-
-            for j in range(self.p.markov_chain_length):
-                previous_tour = self.board.tour_order[:]
-
-                # Select two non-adjacent cities (index1, index2) for the 2-opt swap
-                index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-                while index1 == index2 or abs(index1 - index2) == 1 or abs(index1 - index2) == len(self.board.tour_order) - 1:
-                    index1, index2 = np.random.randint(0, len(self.board.tour_order), 2)
-
-                # Perform the 2-opt swap between the selected cities
-                self.board.two_opt_swap(index1, index2)
-                new_distance = self.board.calculate_tour_distance()
-                delta = new_distance - current_distance
-                acceptance_prob = np.exp(-delta / temperature) if delta > 0 else 1
-
-                if delta < 0:
-                    current_distance = new_distance
-                else:
-                    if np.random.rand() < acceptance_prob:
-                        current_distance = new_distance
-                    else:
-                        self.board.tour_order = previous_tour[:]
-
-                # Save current state for visualization
-                self.board.order_tour()
-                self.all_tours.append(self.board.tour_order[:])
-                self.all_lengths.append(current_distance)
-                self.all_temperatures.append(temperature)
-                self.all_acceptance_probs.append(acceptance_prob)
+        n = len(self.board.tour)
+        chain_length = len(lengths)
+        max_accepted = self.p.accepted_moves_per_chain or chain_length
+        if self.use_kernel:
+            return self._kernel_chain(rng, n, temperature, current_distance, max_accepted, lengths, deltas)
+
+        neighbor_proposals = self.p.proposal == 'neighbor'
+        record_steps = self.recorder.policy in PER_STEP_POLICIES
+        if neighbor_proposals:
+            proposals, thresholds = self._draw_neighbor_chain(rng, n, chain_length, temperature)
+        else:
+            proposals, thresholds = self._draw_chain(rng, n, chain_length, temperature)
+
+        accepted_moves = 0
+        for j in range(chain_length):
+            if neighbor_proposals:
+                move = self.board.neighbor_two_opt(*proposals[j])
+            else:
+                move = proposals[j]
+
+            # Evaluate the move from the affected edges and only apply it when accepted,
+            # a neighbor proposal that has no valid move counts as a rejected move
+            if move is None:
+                delta, accepted = 0.0, False
+            else:
+                delta = self.board.move_delta(move)
+                accepted = delta < thresholds[j]
+            if accepted:
+                self.board.apply_move(move)
+                current_distance += delta
+                accepted_moves += 1
+
+            lengths[j] = current_distance
+            deltas[j] = delta
+            if record_steps:
+                self.recorder.record_step(
+                    step + j, self.board.tour, current_distance, move if accepted else None, self.board.start_index,
+                )
+            if accepted_moves == max_accepted:
+                return current_distance, j + 1
+        return current_distance, chain_length
+
+    def _fit_temperatures(self, schedule: CoolingSchedule) -> CoolingSchedule:
+        """
+        Set self.initial_temperature and return the schedule, see fit_temperatures.
+        """
+        self.initial_temperature, schedule = fit_temperatures(self.p, self.board, schedule, self.p.proposal)
+        return schedule
 
-        self.board.order_tour()
+    def _kernel_chain(self, rng: np.random.Generator, n: int, temperature: float, current_distance: float,
+                      max_accepted: int, lengths: np.ndarray, deltas: np.ndarray) -> tuple:
+        """
+        Run one Markov chain in the compiled kernel, drawing the same random numbers as the Python loop.
+        The chain ends after max_accepted accepted moves or after len(lengths) steps.
+        post:
+        - The board tour, its position index and start_index are updated, lengths and deltas are filled
+          for the steps of the chain.
+        - Returns the tour length and the number of steps at the end of the chain.
+        """
+        board = self.board
+        length = len(lengths)
+        if self.p.proposal == 'neighbor':
+            cities, ranks, directions, thresholds = self._draw_neighbor_proposals(rng, n, length, temperature)
+            current_distance, start_index, steps = kernels.anneal_neighbor_chain(
+                board.tour, board.position, board.neighbors, board.distance_matrix, cities, ranks, directions,
+                thresholds, float(current_distance), max_accepted, lengths, deltas,
+            )
+        else:
+            kinds, a, b, c, thresholds = self._draw_moves(rng, n, length, temperature)
+            position = board._position if board._position is not None else np.empty(0, dtype=np.int32)
+            current_distance, start_index, steps = kernels.anneal_chain(
+                board.tour, position, board.distance_matrix, kinds, a, b, c, thresholds, float(current_distance),
+                board.start_index, max_accepted, lengths, deltas,
+            )
+        board.start_index = int(start_index)
+        return current_distance, steps
 
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        print(f"Simulation took {elapsed_time:.2f} seconds.")
+    def simulated_annealing_exp_cooling(self):
+        """
+        Perform simulated annealing with exponential cooling, T_i = T_0 * cooling_rate^(i + 1).
+        """
+        self.simulated_annealing(ExponentialCooling(self.p.cooling_rate))
 
-        print("=========Simulated Annealing finished=========")
-        print(self.board)
+    def simulated_annealing_log_cool(self):
+        """
+        Perform simulated annealing with logarithmic cooling, T_i = T_0 / (1 + beta * ln(1 + i)).
+        """
+        self.simulated_annealing(LogarithmicCooling(self.p.beta))
 
-        if self.p.save_data:
-                self._save_data()
+    def simulated_annealing_lin_cool(self):
+        """
+        Perform simulated annealing with linear cooling, T_i = max(0.1, T_0 - cooling_rate * i).
+        """
+        self.simulated_annealing(LinearCooling(self.p.cooling_rate))
 
     def _save_data(self):
         """
-        Save all collected data to CSV files if save_data is True.
+        Complete the output folder of the run if save_data is True.
         pre:
         - self.p.save_data must be True to perform saving.
         - The specified output folder must be writable or creatable.
         post:
-        - Saves the tour data, lengths, temperatures, and acceptance probabilities to CSV files.
+        - The Recorder has streamed the scalar series and the tour snapshots to the folder during the run,
+          the remaining buffered data and the final tour are written and the run is marked complete.
         - Prints the directory where the data is saved.
         """
         if not self.p.save_data:
             return
 
-        folder_path = os.path.abspath(os.path.join("output", self.p.folder_name))
-        os.makedirs(folder_path, exist_ok=True)
-        def write_csv(file_name, data, header=""):
-            file_path = os.path.join(folder_path, file_name)
-            with open(file_path, mode="w", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow([header])  
-                writer.writerows(data) 
-
-        params_header = (
-            f"Problem Set: {self.p.problem_set}, "
-            f"Initial Temperature: {self.p.initial_temperature}, "
-            f"Cooling Rate: {self.p.cooling_rate}, "
-            f"Markov Chain Length: {self.p.markov_chain_length}, "
-            f"Number of Markov Chains: {self.p.num_markov_chains}"
-        )
-
-        write_csv("all_tours.csv", [[node.ID for node in tour] for tour in self.all_tours], params_header)
-        write_csv("all_lengths.csv", [[length] for length in self.all_lengths], params_header)
-        write_csv("all_temperatures.csv", [[temp] for temp in self.all_temperatures], params_header)
-        write_csv("all_acceptance_probs.csv", [[prob] for prob in self.all_acceptance_probs], params_header)
-
-        print(f"Data saved to folder: {folder_path}")
-
-    def logarithmic_cooling(self, t_initial, beta, i):
-        """
-        Cooling in accordance with logarithmic schedule.
-        pre:
-            T_initial (float): The initial temperature.
-            beta (float): Cooling rate constant.
-            k (int): Current iteration number.
-        post:
-            float: Updated temperature.
-        """
-        if i == 0:
-            return t_initial
-        return t_initial / (1 + beta * np.log(1 + i))
-
-    def linear_cooling(self, t_initial, cooling_rate , i):
-        """
-        Cooling in accordance with linear schedule.
-        pre:
-            T_current (float): Current temperature.
-            Cooling (float): Cooling rate given. 
-            k (int): Current iteration number.  
-        post:
-            float: Updated temperature.
-        """
-        return max(0.1, t_initial - cooling_rate * i)
-
-
+        self.recorder.save()
+        print(f"Data saved to folder: {self.recorder.folder_path}")
+
+
+def fit_temperatures(params, board, schedule: CoolingSchedule, proposal: str) -> tuple:
+    """
+    Resolve the initial temperature of a run, from params.initial_acceptance, params.initial_temperature or
+    board.recommended_temperature(), and fit the schedule to reach the temperature of params.final_acceptance
+    if it is given. The acceptance targets are measured on moves drawn by proposal.
+    post:
+    - Returns the initial temperature and the schedule.
+    """
+    deltas = None
+    if params.initial_acceptance is not None or params.final_acceptance is not None:
+        deltas = board.sample_two_opt_deltas(params.num_temperature_samples, proposal)
+
+    if params.initial_acceptance is not None:
+        initial_temperature = temperature_for_acceptance(deltas, params.initial_acceptance)
+        print(f"Initial temperature for an acceptance ratio of {params.initial_acceptance}: "
+              f"{initial_temperature:.2f}")
+    elif params.initial_temperature is None:
+        initial_temperature = board.recommended_temperature()
+        print(f"Initial temperature recommended for the {board.initial_tour} tour: {initial_temperature:.2f}")
+    else:
+        initial_temperature = params.initial_temperature
+
+    if params.final_acceptance is not None:
+        final_temperature = temperature_for_acceptance(deltas, params.final_acceptance)
+        print(f"Final temperature for an acceptance ratio of {params.final_acceptance}: {final_temperature:.4f}")
+        schedule = schedule.with_final_temperature(initial_temperature, final_temperature, params.num_markov_chains)
+    return initial_temperature, schedule
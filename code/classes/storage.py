@@ -0,0 +1,317 @@
+import os
+import sys
+import csv
+import itertools
+import json
+import queue
+import struct
+import threading
+import numpy as np
+from code.classes.movelog import MoveLog
+
+FORMAT_VERSION = 1
+NPY_HEADER_SIZE = 128
+SERIES = ('lengths', 'temperatures', 'acceptance_probs')
+# Values read from the CSV files per chunk by convert_csv_folder
+CSV_CHUNK_SIZE = 65536
+CSV_HEADER_FIELDS = {
+    'Problem Set': 'problem_set',
+    'Initial Temperature': 'initial_temperature',
+    'Cooling Rate': 'cooling_rate',
+    'Markov Chain Length': 'markov_chain_length',
+    'Number of Markov Chains': 'num_markov_chains',
+    'Record Policy': 'record_policy',
+}
+
+
+def save_run(folder_path: str, parameters: dict, series: dict, tours: np.ndarray, tour_steps: np.ndarray,
+             final_tour: np.ndarray, move_log: MoveLog = None):
+    """
+    Save the data of an annealing run as one .npy file per column plus a metadata.json file.
+    pre:
+    - parameters must be a JSON serializable dict of the run parameters.
+    - series must map every name in SERIES to a 1D array with one value per step.
+    - tours, tour_steps and final_tour must hold node indices (node ID - 1) and step indices.
+    post:
+    - Writes lengths.npy, temperatures.npy, acceptance_probs.npy, tours.npy, tour_steps.npy and
+      final_tour.npy to folder_path, and move_initial_tour.npy, move_steps.npy, moves.npy and keyframe_starts.npy
+      if a move log is given.
+    - Writes metadata.json last, so a folder with metadata always holds a complete run.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+
+    columns = {name: np.asarray(series[name], dtype=np.float64) for name in SERIES}
+    columns['tours'] = np.asarray(tours, dtype=np.int32)
+    columns['tour_steps'] = np.asarray(tour_steps, dtype=np.int64)
+    columns['final_tour'] = np.asarray(final_tour, dtype=np.int32)
+    if move_log is not None:
+        columns['move_initial_tour'] = move_log.initial_tour.astype(np.int32)
+        columns['move_steps'] = move_log.move_steps.astype(np.int64)
+        columns['moves'] = move_log.moves.astype(np.int32)
+        columns['keyframe_starts'] = np.asarray(move_log.keyframe_starts, dtype=np.int64)
+
+    for name, values in columns.items():
+        np.save(os.path.join(folder_path, f'{name}.npy'), values)
+
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'tour_encoding': 'node_index',
+        'parameters': parameters,
+        'complete': True,
+        'num_steps': len(columns['lengths']),
+        'columns': {name: {'dtype': str(values.dtype), 'shape': list(values.shape)} for name, values in columns.items()},
+    }
+    with open(os.path.join(folder_path, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_run(folder_path: str) -> dict:
+    """
+    Load a run saved with save_run, memory-mapping every column so that it is read lazily.
+    pre:
+    - folder_path must contain a metadata.json file and the columns it lists.
+    post:
+    - Returns a dict with the metadata under 'metadata', every column as a read-only memory-mapped array
+      under its name, and under 'move_log' a MoveLog for runs with a move log, else None.
+    - For a run that is still being written by a RunWriter (or that crashed), every column holds the
+      complete rows that have reached the disk so far.
+    - Raises FileNotFoundError if the folder holds no binary run, with a hint for old CSV output folders.
+    """
+    metadata_path = os.path.join(folder_path, 'metadata.json')
+    if not os.path.exists(metadata_path):
+        hint = ''
+        if os.path.exists(os.path.join(folder_path, 'all_lengths.csv')):
+            hint = f' It holds CSV output: convert it with `python -m code.classes.storage {folder_path}`.'
+        raise FileNotFoundError(f'File {metadata_path} does not exist.{hint}')
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+
+    run = {'metadata': metadata}
+    for name, column in metadata['columns'].items():
+        path = os.path.join(folder_path, f'{name}.npy')
+        if metadata['complete']:
+            run[name] = np.load(path, mmap_mode='r')
+        else:
+            run[name] = _tail_column(path, np.dtype(column['dtype']), tuple(column['shape'][1:]))
+
+    run['move_log'] = None
+    if 'moves' in run and len(run['move_initial_tour']) > 0:
+        run['move_log'] = MoveLog(
+            run['move_initial_tour'], run['move_steps'], run['moves'],
+            run['tour_steps'], run['tours'], len(run['lengths']), run['keyframe_starts'],
+        )
+    return run
+
+
+def _tail_column(path: str, dtype: np.dtype, row_shape: tuple) -> np.ndarray:
+    """
+    Memory-map the complete rows of a column file that is still being appended to.
+    The header of such a file does not know its final shape yet, so the rows are counted from the file size.
+    """
+    row_size = dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+    with open(path, 'rb') as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+    num_rows = (os.path.getsize(path) - offset) // row_size if row_size else 0
+    if num_rows == 0:
+        return np.empty((0,) + row_shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(num_rows,) + row_shape)
+
+
+def _npy_header(dtype: np.dtype, shape: tuple) -> bytes:
+    """
+    Build a version 1.0 .npy header padded to a fixed NPY_HEADER_SIZE bytes,
+    so that it can be rewritten in place once the final shape of an appended column is known.
+    """
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+    header = header.encode('latin1').ljust(NPY_HEADER_SIZE - 11) + b'\n'
+    return np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header
+
+
+class RunWriter:
+    def __init__(self, folder_path: str, parameters: dict, columns: dict):
+        """
+        Initialize a RunWriter that streams the columns of a run to .npy files in folder_path while the run
+        is going. Chunks are written and flushed by a background thread, so disk I/O overlaps the annealing.
+        pre:
+        - parameters must be a JSON serializable dict of the run parameters.
+        - columns must map every column name to a (dtype, row_shape) pair.
+        post:
+        - The folder, an empty .npy file per column and a metadata.json marked incomplete are created,
+          so load_run can follow the run while it is written.
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        self.folder_path = folder_path
+        self.parameters = parameters
+        self.columns = {name: (np.dtype(dtype), tuple(row_shape)) for name, (dtype, row_shape) in columns.items()}
+        self.num_rows = {name: 0 for name in self.columns}
+
+        self._files = {}
+        for name, (dtype, row_shape) in self.columns.items():
+            f = open(os.path.join(folder_path, f'{name}.npy'), 'wb')
+            f.write(_npy_header(dtype, (0,) + row_shape))
+            self._files[name] = f
+        self._write_metadata(complete=False)
+
+        self._queue = queue.Queue(maxsize=64)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def append(self, name: str, values: np.ndarray):
+        """
+        Queue rows to be appended to a column. The array must not be modified afterwards.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((name, values))
+
+    def _write_chunks(self):
+        """
+        Write the queued chunks to their column files until close() queues None.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            name, values = item
+            try:
+                dtype, row_shape = self.columns[name]
+                f = self._files[name]
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                f.flush()
+                self.num_rows[name] += len(values)
+            except Exception as error:
+                self._error = error
+
+    def close(self):
+        """
+        Write the remaining chunks, store the final shapes in the .npy headers and mark the run complete.
+        post:
+        - Raises the first error the background thread ran into, if any.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        for name, f in self._files.items():
+            dtype, row_shape = self.columns[name]
+            f.seek(0)
+            f.write(_npy_header(dtype, (self.num_rows[name],) + row_shape))
+            f.close()
+        if self._error is not None:
+            raise self._error
+        self._write_metadata(complete=True)
+
+    def _write_metadata(self, complete: bool):
+        """
+        Write metadata.json, atomically so that a process following the run never reads a partial file.
+        """
+        metadata = {
+            'format_version': FORMAT_VERSION,
+            'tour_encoding': 'node_index',
+            'parameters': self.parameters,
+            'complete': complete,
+            'num_steps': self.num_rows['lengths'],
+            'columns': {
+                name: {'dtype': str(dtype), 'shape': [self.num_rows[name], *row_shape]}
+                for name, (dtype, row_shape) in self.columns.items()
+            },
+        }
+        path = os.path.join(self.folder_path, 'metadata.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+def _parse_csv_header(header: str) -> dict:
+    """
+    Parse the free-text parameter header of the CSV output files into a parameter dict.
+    """
+    parameters = {}
+    for item in header.split(', '):
+        label, _, value = item.partition(': ')
+        if label not in CSV_HEADER_FIELDS:
+            continue
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        parameters[CSV_HEADER_FIELDS[label]] = value
+    return parameters
+
+
+def convert_csv_folder(folder_path: str):
+    """
+    Convert an output folder written by the CSV writer (all_*.csv files) to the binary format.
+    The CSV files are read and written through a RunWriter in chunks of about CSV_CHUNK_SIZE values,
+    so memory stays bounded for output folders of any size.
+    pre:
+    - folder_path must contain all_tours.csv, all_lengths.csv, all_temperatures.csv and all_acceptance_probs.csv,
+      each with a parameter header row, and all_tours.csv a tour of node IDs per step.
+    post:
+    - Writes the binary columns and metadata.json next to the CSV files, which are left in place.
+    - The CSV writer stored a snapshot of every step and no final tour, so the steps of the snapshots are numbered
+      consecutively and the last snapshot is used as the final tour.
+    """
+    def read_csv(file_name):
+        file = open(os.path.join(folder_path, file_name), newline='')
+        reader = csv.reader(file)
+        header = next(reader, [])
+        return file, (header[0] if header else ''), reader
+
+    tours_file, header, tour_rows = read_csv('all_tours.csv')
+    with tours_file:
+        first_row = next(tour_rows, [])
+        n = len(first_row)
+        parameters = _parse_csv_header(header)
+        parameters['folder_name'] = os.path.basename(os.path.normpath(folder_path))
+        writer = RunWriter(folder_path, parameters, {
+            **{name: (np.float64, ()) for name in SERIES},
+            'tours': (np.int32, (n,)),
+            'tour_steps': (np.int64, ()),
+            'final_tour': (np.int32, ()),
+        })
+
+        final_tour = np.empty(0, dtype=np.int32)
+        num_tours = 0
+        rows = itertools.chain([first_row], tour_rows) if first_row else tour_rows
+        for chunk in _chunks(rows, max(1, CSV_CHUNK_SIZE // max(n, 1))):
+            tours = np.array(chunk, dtype=np.int32) - 1
+            writer.append('tours', tours)
+            writer.append('tour_steps', np.arange(num_tours, num_tours + len(tours), dtype=np.int64))
+            num_tours += len(tours)
+            final_tour = tours[-1]
+        writer.append('final_tour', final_tour)
+
+    for name in SERIES:
+        file, _, rows = read_csv(f'all_{name}.csv')
+        with file:
+            for chunk in _chunks(rows, CSV_CHUNK_SIZE):
+                writer.append(name, np.array([row[0] for row in chunk], dtype=np.float64))
+    writer.close()
+
+
+def _chunks(rows, size: int):
+    """
+    Split an iterator of rows into lists of at most size rows.
+    """
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+if __name__ == '__main__':
+    folders = sys.argv[1:] or [
+        os.path.join('output', name) for name in sorted(os.listdir('output'))
+        if os.path.exists(os.path.join('output', name, 'all_lengths.csv'))
+    ]
+    for folder in folders:
+        convert_csv_folder(folder)
+        print(f'Converted {folder}')
@@ -0,0 +1,210 @@
+from code.classes.board import Board
+from code.classes.solver import Solver
+from code.classes.shared import SharedInstance, attach
+import dataclasses
+import multiprocessing
+import time
+import numpy as np
+import os
+
+
+def geometric_ladder(minimum_temperature: float, maximum_temperature: float, num_replicas: int) -> np.ndarray:
+    """
+    Build a temperature ladder with a constant ratio between neighboring rungs, from cold to hot.
+    A constant ratio gives roughly equal swap acceptance rates along the ladder.
+    """
+    return np.geomspace(minimum_temperature, maximum_temperature, num_replicas)
+
+
+class ParallelTemperingSolver:
+    def __init__(self, params, temperatures):
+        """
+        Initialize a ParallelTemperingSolver that runs one replica per temperature of a fixed ladder,
+        each in its own worker process, and periodically exchanges the states of neighboring rungs.
+        pre:
+        - params must include attributes for the problem set, markov chain length, number of markov chains,
+          seed and save_data option. The replicas use the proposal, moves, kernel and accepted moves per chain
+          of params. The cooling parameters are not used, and patience and the acceptance targets, which
+          only apply to a cooling schedule, must be None.
+        - temperatures must hold at least two positive temperatures, sorted from cold to hot,
+          for example built with geometric_ladder.
+        post:
+        - A ParallelTemperingSolver instance is created, every replica starts from the initial tour of the Board.
+        """
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        if len(self.temperatures) < 2 or np.any(self.temperatures <= 0) or np.any(np.diff(self.temperatures) <= 0):
+            raise ValueError('temperatures must be at least two positive temperatures sorted from cold to hot')
+        if params.patience is not None or params.initial_acceptance is not None \
+                or params.final_acceptance is not None:
+            raise ValueError('Parallel tempering runs a fixed temperature ladder: patience, initial_acceptance and '
+                             'final_acceptance are not supported')
+
+        self.board = Board(params)
+        self.p = params
+        self.best_tour = None
+        self.best_length = self.board.calculate_tour_distance()
+        self.rung_lengths = np.empty((0, len(self.temperatures)))
+        self.swap_acceptance_rates = np.zeros(len(self.temperatures) - 1)
+
+    def solve(self):
+        """
+        Perform parallel tempering with the moves of the Solver.
+        Every round, each replica runs a Markov chain of markov_chain_length steps at the temperature of its rung,
+        then the parent attempts to exchange neighboring rungs, alternating between the even and the odd pairs.
+        The exchange of rungs r and r + 1 is accepted with the Metropolis swap criterion
+        min(1, exp((1 / T_r - 1 / T_r+1) * (L_r - L_r+1))); instead of sending tours, the replicas swap temperatures.
+        The replicas and the exchanges draw from independent streams spawned from self.p.seed.
+        pre:
+        - self.p.num_markov_chains is the number of rounds.
+        post:
+        - self.best_tour and self.best_length hold the best tour any replica held at the end of a round,
+          canonically rotated, and the board tour is set to it.
+        - self.rung_lengths holds the tour length at every rung after every round, shaped (rounds, rungs).
+        - self.swap_acceptance_rates holds the fraction of accepted exchanges between rung r and r + 1.
+        - Optionally saves the results to the output folder.
+        """
+        print('=========Parallel Tempering started===========')
+
+        start_time = time.time()
+
+        num_rungs = len(self.temperatures)
+        seeds = np.random.SeedSequence(self.p.seed).spawn(num_rungs + 1)
+        rng = np.random.default_rng(seeds[-1])
+        worker_params = dataclasses.replace(self.p, save_data=False, record_policy='none')
+
+        # replica_at[r] is the replica currently at rung r
+        replica_at = np.arange(num_rungs)
+        lengths = np.full(num_rungs, self.board.calculate_tour_distance())
+        best_lengths = lengths.copy()
+        rung_lengths = np.empty((self.p.num_markov_chains, num_rungs))
+        swaps_accepted = np.zeros(num_rungs - 1)
+        swaps_attempted = np.zeros(num_rungs - 1)
+
+        context = multiprocessing.get_context()
+        connections, workers = [], []
+        with SharedInstance(self.board) as instance:
+            try:
+                for replica in range(num_rungs):
+                    parent_end, worker_end = context.Pipe()
+                    worker = context.Process(
+                        target=_replica_worker, args=(worker_end, worker_params, instance.spec, seeds[replica]),
+                        daemon=True,
+                    )
+                    worker.start()
+                    worker_end.close()
+                    connections.append(parent_end)
+                    workers.append(worker)
+
+                for i in range(self.p.num_markov_chains):
+                    for rung, replica in enumerate(replica_at):
+                        connections[replica].send(('run', self.temperatures[rung], self.p.markov_chain_length))
+                    for replica, connection in enumerate(connections):
+                        lengths[replica], best_lengths[replica] = _receive(connection)
+
+                    for rung in range(i % 2, num_rungs - 1, 2):
+                        cold, hot = replica_at[rung], replica_at[rung + 1]
+                        exponent = (1 / self.temperatures[rung] - 1 / self.temperatures[rung + 1]) \
+                            * (lengths[cold] - lengths[hot])
+                        swaps_attempted[rung] += 1
+                        if exponent >= 0 or rng.random() < np.exp(exponent):
+                            replica_at[rung], replica_at[rung + 1] = hot, cold
+                            swaps_accepted[rung] += 1
+
+                    rung_lengths[i] = lengths[replica_at]
+
+                best_replica = int(np.argmin(best_lengths))
+                connections[best_replica].send(('best',))
+                self.board.tour = _receive(connections[best_replica])
+            finally:
+                for connection in connections:
+                    try:
+                        connection.send(('stop',))
+                    except OSError:
+                        pass
+                    connection.close()
+                for worker in workers:
+                    worker.join()
+
+        self.board.order_tour()
+        self.best_tour = self.board.tour.copy()
+        self.best_length = self.board.calculate_tour_distance()
+        self.rung_lengths = rung_lengths
+        self.swap_acceptance_rates = np.divide(
+            swaps_accepted, swaps_attempted, out=np.zeros(num_rungs - 1), where=swaps_attempted > 0,
+        )
+
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        print(f"Simulation took {elapsed_time:.2f} seconds.")
+
+        print("=========Parallel Tempering finished==========")
+        print(f"Swap acceptance rate per rung pair: {np.round(self.swap_acceptance_rates, 3)}")
+        print(self.board)
+
+        if self.p.save_data:
+            self._save_data()
+
+    def _save_data(self):
+        """
+        Save the results to tempering.npz in the output folder if save_data is True.
+        """
+        if not self.p.save_data:
+            return
+
+        folder_path = os.path.abspath(os.path.join("output", self.p.folder_name))
+        os.makedirs(folder_path, exist_ok=True)
+        np.savez(
+            os.path.join(folder_path, "tempering.npz"),
+            temperatures=self.temperatures, best_tour=self.best_tour, best_length=self.best_length,
+            rung_lengths=self.rung_lengths, swap_acceptance_rates=self.swap_acceptance_rates,
+        )
+        print(f"Data saved to folder: {folder_path}")
+
+
+def _receive(connection):
+    """
+    Receive the reply of a replica worker, raising the error the worker ran into, if any.
+    """
+    reply = connection.recv()
+    if isinstance(reply, Exception):
+        raise reply
+    return reply
+
+
+def _replica_worker(connection, params, spec: dict, seed: np.random.SeedSequence):
+    """
+    Hold one replica in a worker process and run its Markov chains on request, with Solver.run_chain, so
+    that the replica uses the proposals, moves and kernel of params like a Solver.
+    Commands are ('run', temperature, length), answered with the current and the best tour length at the end of
+    a chain, ('best',), answered with the best tour at the end of a chain, and ('stop',).
+    """
+    try:
+        solver = Solver(params, attach(spec))
+        board = solver.board
+        rng = np.random.default_rng(seed)
+        current_distance = board.calculate_tour_distance()
+        best_distance = current_distance
+        best_tour = board.tour.copy()
+    except Exception as error:
+        connection.send(error)
+        return
+
+    while True:
+        command = connection.recv()
+        if command[0] == 'stop':
+            return
+        try:
+            if command[0] == 'best':
+                connection.send(best_tour)
+                continue
+
+            _, temperature, chain_length = command
+            current_distance, _ = solver.run_chain(
+                rng, temperature, current_distance, np.empty(chain_length), np.empty(chain_length),
+            )
+            if current_distance < best_distance:
+                best_distance = current_distance
+                best_tour = board.tour.copy()
+            connection.send((float(current_distance), float(best_distance)))
+        except Exception as error:
+            connection.send(error)
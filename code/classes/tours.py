@@ -0,0 +1,160 @@
+import numpy as np
+
+
+class TwoLevelList:
+    def __init__(self, tour: np.ndarray):
+        """
+        Initialize a TwoLevelList, a tour stored as a cyclic list of about sqrt(n) segments of consecutive nodes,
+        each with a reversed bit. next and prev take O(1) and reversing a path takes O(sqrt(n)),
+        as it only splits the two segments at its ends and reverses the order of the segments in between,
+        or of the segments outside of it if they are fewer.
+        pre:
+        - tour must be a permutation of the node indices 0..n - 1 with n >= 3.
+        post:
+        - A TwoLevelList instance is created holding the tour in the given order.
+        """
+        self.n = len(tour)
+        self.segment_size = max(8, int(np.sqrt(self.n)))
+        self.max_segments = 4 * (self.n // self.segment_size + 1)
+        self._build(np.asarray(tour))
+
+    def _build(self, tour: np.ndarray):
+        """
+        Split the tour into segments of segment_size nodes, none of them reversed.
+        """
+        tour = np.array(tour, dtype=np.int32)
+        num_segments = -(-self.n // self.segment_size)
+        self.segments = np.split(tour, np.arange(self.segment_size, self.n, self.segment_size))
+
+        # order[r] is the segment at rank r along the tour, rank is its inverse; both have room for the segments
+        # that splits add before the next rebuild
+        capacity = self.max_segments + 3
+        self.order = np.arange(num_segments)
+        self.rank = np.zeros(capacity, dtype=np.int64)
+        self.rank[:num_segments] = self.order
+        self.reversed = np.zeros(capacity, dtype=bool)
+
+        # The index of a node within its segment is index_in_segment[node] - offset[segment of node], so that
+        # a split only has to renumber the nodes it moves to the new segment
+        self.offset = np.zeros(capacity, dtype=np.int64)
+
+        sequence = np.arange(self.n)
+        self.segment_of = np.empty(self.n, dtype=np.int64)
+        self.segment_of[tour] = sequence // self.segment_size
+        self.index_in_segment = np.empty(self.n, dtype=np.int64)
+        self.index_in_segment[tour] = sequence % self.segment_size
+
+    def to_array(self) -> np.ndarray:
+        """
+        Return the tour as an int32 array of node indices, starting with node index 0.
+        """
+        tour = np.concatenate([
+            self.segments[segment][::-1] if self.reversed[segment] else self.segments[segment]
+            for segment in self.order
+        ]).astype(np.int32)
+        return np.roll(tour, -int(np.argmax(tour == 0)))
+
+    def next(self, node: int) -> int:
+        """
+        Return the node after node in the tour.
+        """
+        segment = self.segment_of[node]
+        nodes = self.segments[segment]
+        i = self.index_in_segment[node] - self.offset[segment] + (-1 if self.reversed[segment] else 1)
+        if 0 <= i < len(nodes):
+            return int(nodes[i])
+        following = self.order[(self.rank[segment] + 1) % len(self.order)]
+        return int(self.segments[following][-1 if self.reversed[following] else 0])
+
+    def prev(self, node: int) -> int:
+        """
+        Return the node before node in the tour.
+        """
+        segment = self.segment_of[node]
+        nodes = self.segments[segment]
+        i = self.index_in_segment[node] - self.offset[segment] + (1 if self.reversed[segment] else -1)
+        if 0 <= i < len(nodes):
+            return int(nodes[i])
+        preceding = self.order[self.rank[segment] - 1]
+        return int(self.segments[preceding][0 if self.reversed[preceding] else -1])
+
+    def _split_before(self, node: int):
+        """
+        Split the segment of node so that node is the first node of its segment along the tour.
+        The smaller part becomes a new segment, which is placed before or after the old one in the order.
+        """
+        segment = self.segment_of[node]
+        nodes = self.segments[segment]
+        i = int(self.index_in_segment[node] - self.offset[segment])
+        if self.reversed[segment]:
+            # Along the tour the segment runs from its last to its first index, node must start a part
+            if i == len(nodes) - 1:
+                return
+            first, second = nodes[i + 1:], nodes[:i + 1]
+        else:
+            if i == 0:
+                return
+            first, second = nodes[:i], nodes[i:]
+
+        # first precedes second along the tour, keep the larger part in the old segment
+        new_segment = len(self.segments)
+        if len(first) <= len(second):
+            moved, kept, position = first, second, self.rank[segment]
+        else:
+            moved, kept, position = second, first, self.rank[segment] + 1
+
+        if self.reversed[segment]:
+            kept_start = 0 if kept is second else i + 1
+        else:
+            kept_start = 0 if kept is first else i
+        self.segments[segment] = kept.copy()
+        self.offset[segment] += kept_start
+        self.segments.append(moved.copy())
+        self.reversed[new_segment] = self.reversed[segment]
+        self.offset[new_segment] = 0
+        self.segment_of[moved] = new_segment
+        self.index_in_segment[moved] = np.arange(len(moved))
+
+        self.order = np.concatenate((self.order[:position], [new_segment], self.order[position:]))
+        self.rank[self.order[position:]] = np.arange(position, len(self.order))
+
+    def reverse(self, a: int, b: int):
+        """
+        Reverse the path from a to b that follows next, so that the tour visits b ... a in its place.
+        The tour may come out in the opposite direction, if reversing the rest of the tour was cheaper,
+        which is the same cycle.
+        """
+        if a == b or self.next(b) == a:
+            return
+
+        segment = self.segment_of[a]
+        if segment == self.segment_of[b]:
+            i = int(self.index_in_segment[a] - self.offset[segment])
+            j = int(self.index_in_segment[b] - self.offset[segment])
+            if (i <= j) != self.reversed[segment]:
+                # The path lies within one segment, reverse it in place
+                low, high = min(i, j), max(i, j)
+                nodes = self.segments[segment]
+                nodes[low:high + 1] = nodes[low:high + 1][::-1]
+                self.index_in_segment[nodes[low:high + 1]] = np.arange(low, high + 1) + self.offset[segment]
+                return
+
+        after = self.next(b)
+        self._split_before(a)
+        self._split_before(after)
+
+        # The path now consists of whole segments, reverse the order of the fewer of the path and the rest
+        num_segments = len(self.order)
+        first_rank, last_rank = self.rank[self.segment_of[a]], self.rank[self.segment_of[b]]
+        length = (last_rank - first_rank) % num_segments + 1
+        if 2 * length > num_segments:
+            first_rank, length = (last_rank + 1) % num_segments, num_segments - length
+
+        ranks = (first_rank + np.arange(length)) % num_segments
+        segments = self.order[ranks][::-1]
+        self.order[ranks] = segments
+        self.rank[segments] = ranks
+        self.reversed[segments] ^= True
+
+        if num_segments > self.max_segments:
+            self._build(self.to_array())
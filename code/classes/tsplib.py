@@ -0,0 +1,273 @@
+import os
+import re
+import math
+import hashlib
+import tempfile
+import numpy as np
+
+EDGE_WEIGHT_TYPES = {'EUC_2D', 'CEIL_2D', 'ATT', 'GEO'}
+GEO_EARTH_RADIUS = 6378.388
+GEO_PI = 3.141592
+INSTANCE_CACHE_VERSION = 1
+
+_SECTION_END = re.compile(rb'^\s*(EOF|-1|[A-Z_]+_SECTION)\b', re.MULTILINE)
+
+
+def file_digest(path: str) -> str:
+    """
+    Hash the contents of a file, the key of the cached instance and distance matrix files.
+    """
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def _read_specification(data: bytes) -> dict:
+    """
+    Parse the 'KEY : VALUE' specification lines of a TSPLIB file up to its first section.
+    """
+    specification = {}
+    for line in data.splitlines():
+        line = line.decode('latin1').strip()
+        if line.endswith('_SECTION') or line == 'EOF':
+            break
+        key, separator, value = line.partition(':')
+        if separator:
+            specification[key.strip().upper()] = value.strip()
+    return specification
+
+
+def _read_section(data: bytes, name: bytes) -> np.ndarray:
+    """
+    Parse the numbers of a section in bulk, up to EOF, -1 or the next section.
+    """
+    start = data.find(name)
+    if start < 0:
+        raise ValueError(f'File has no {name.decode()}')
+    start = data.index(b'\n', start) + 1
+    end = _SECTION_END.search(data, start)
+    return np.array(data[start:end.start() if end else len(data)].split(), dtype=float)
+
+
+def read_instance(path: str) -> dict:
+    """
+    Read the cities of a TSPLIB file with a NODE_COORD_SECTION.
+    pre:
+    - path must be a TSPLIB TSP file with an EDGE_WEIGHT_TYPE in EDGE_WEIGHT_TYPES and nodes numbered 1 to DIMENSION.
+    post:
+    - Returns a dict with the name, the edge weight type, the digest of the file, the node indices (node ID - 1)
+      in file order as an int32 array and the x and y coordinates as float arrays indexed by node index.
+    - Raises ValueError if the number of nodes does not match the dimension, the node IDs are not numbered
+      1 to dimension, or the edge weight type is not supported.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    specification = _read_specification(data)
+
+    edge_weight_type = specification.get('EDGE_WEIGHT_TYPE')
+    if edge_weight_type not in EDGE_WEIGHT_TYPES:
+        raise ValueError(f'Unsupported edge weight type {edge_weight_type}: choose one of {", ".join(EDGE_WEIGHT_TYPES)}')
+
+    dimension = int(specification['DIMENSION'])
+    rows = _read_section(data, b'NODE_COORD_SECTION')
+    if len(rows) != 3 * dimension:
+        raise ValueError('Number of nodes does not match dimension')
+    rows = rows.reshape(dimension, 3)
+
+    file_tour = rows[:, 0].astype(np.int32) - 1
+    if not np.array_equal(np.sort(file_tour), np.arange(dimension)):
+        raise ValueError('Node IDs must be numbered 1 to dimension')
+
+    x = np.empty(dimension)
+    y = np.empty(dimension)
+    x[file_tour] = rows[:, 1]
+    y[file_tour] = rows[:, 2]
+    return {
+        'name': specification.get('NAME', os.path.basename(path)),
+        'edge_weight_type': edge_weight_type,
+        'digest': hashlib.sha1(data).hexdigest()[:12],
+        'file_tour': file_tour,
+        'x': x,
+        'y': y,
+    }
+
+
+def load_instance(path: str, cache_dir: str) -> dict:
+    """
+    Read a TSPLIB file like read_instance, through a binary cache of parsed instances.
+    The cache file is keyed by the hash of the TSPLIB file, so an edited file is parsed again.
+    post:
+    - Returns the dict of read_instance, loaded from cache_dir if the file was parsed before.
+    - Writes the cache file atomically, so concurrent runs never read a partial file.
+    """
+    digest = file_digest(path)
+    cache_path = os.path.join(cache_dir, f'{os.path.basename(path)}-{digest}-instance.npz')
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if int(cached['version']) == INSTANCE_CACHE_VERSION:
+                return {
+                    'name': str(cached['name']),
+                    'edge_weight_type': str(cached['edge_weight_type']),
+                    'digest': digest,
+                    'file_tour': cached['file_tour'],
+                    'x': cached['x'],
+                    'y': cached['y'],
+                }
+
+    instance = read_instance(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(
+            f, version=INSTANCE_CACHE_VERSION, name=instance['name'], edge_weight_type=instance['edge_weight_type'],
+            file_tour=instance['file_tour'], x=instance['x'], y=instance['y'],
+        )
+    os.replace(tmp_path, cache_path)
+    return instance
+
+
+def read_tour(path: str, dimension: int) -> np.ndarray:
+    """
+    Read a tour from a TSPLIB TOUR file.
+    pre:
+    - path must be a TSPLIB tour file with a TOUR_SECTION ending with -1 or EOF.
+    post:
+    - Returns an int32 array of node indices (node ID - 1).
+    - Raises ValueError if the number of nodes does not match the dimension of the instance.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    tour = _read_section(data, b'TOUR_SECTION').astype(np.int32) - 1
+    if len(tour) != dimension:
+        raise ValueError('Number of nodes does not match dimension')
+    return tour
+
+
+def write_instance(path: str, name: str, x: np.ndarray, y: np.ndarray, comment: str = None):
+    """
+    Write the cities of an EUC_2D instance as a TSPLIB TSP file, atomically.
+    post:
+    - The file has the nodes numbered 1 to n in the given order, with the coordinates written to 3 decimals.
+    """
+    lines = [f'NAME : {name}']
+    if comment is not None:
+        lines.append(f'COMMENT : {comment}')
+    lines += ['TYPE : TSP', f'DIMENSION : {len(x)}', 'EDGE_WEIGHT_TYPE : EUC_2D', 'NODE_COORD_SECTION']
+    ids = np.arange(1, len(x) + 1)
+    body = '\n'.join(f'{i} {a:.3f} {b:.3f}' for i, a, b in zip(ids.tolist(), x.tolist(), y.tolist()))
+    _write_atomically(path, '\n'.join(lines) + '\n' + body + '\nEOF\n')
+
+
+def write_tour(path: str, name: str, tour: np.ndarray, comment: str = None):
+    """
+    Write a tour of node indices as a TSPLIB TOUR file of node IDs, atomically.
+    """
+    lines = [f'NAME : {name}']
+    if comment is not None:
+        lines.append(f'COMMENT : {comment}')
+    lines += ['TYPE : TOUR', f'DIMENSION : {len(tour)}', 'TOUR_SECTION']
+    lines += [str(node) for node in (np.asarray(tour) + 1).tolist()]
+    _write_atomically(path, '\n'.join(lines + ['-1', 'EOF', '']))
+
+
+def _write_atomically(path: str, text: str):
+    """
+    Write a text file through a temporary file in the same folder, so a reader never sees a partial file.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _geo_radians(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Convert TSPLIB GEO coordinates, DDD.MM degrees and minutes, to radians.
+    The degrees are truncated as in the reference implementations (the TSPLIB documentation writes nint).
+    """
+    degrees = np.trunc(coordinates)
+    return GEO_PI * (degrees + 5.0 * (coordinates - degrees) / 3.0) / 180.0
+
+
+def distances(x: np.ndarray, y: np.ndarray, rows: np.ndarray, columns: np.ndarray, edge_weight_type: str,
+              rounded: bool) -> np.ndarray:
+    """
+    Compute the distances between the nodes in rows and the nodes in columns, broadcasting the two index arrays.
+    pre:
+    - edge_weight_type must be in EDGE_WEIGHT_TYPES.
+    post:
+    - If rounded, returns the TSPLIB integer distances of the edge weight type as int32: nint for EUC_2D,
+      the ceiling for CEIL_2D, the rounded-up pseudo-Euclidean distance for ATT and the truncated
+      great-circle distance for GEO. Otherwise returns the same distances as floats before rounding.
+    - The distance of a node to itself is 0.
+    """
+    if edge_weight_type == 'GEO':
+        latitude, longitude = _geo_radians(x), _geo_radians(y)
+        q1 = np.cos(longitude[rows] - longitude[columns])
+        q2 = np.cos(latitude[rows] - latitude[columns])
+        q3 = np.cos(latitude[rows] + latitude[columns])
+        cosine = np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0)
+        result = GEO_EARTH_RADIUS * np.arccos(cosine)
+        if rounded:
+            result = (result + 1.0).astype(np.int32)
+        return np.where(rows == columns, 0, result)
+
+    dx = x[rows] - x[columns]
+    dy = y[rows] - y[columns]
+    if edge_weight_type == 'ATT':
+        result = np.sqrt((dx * dx + dy * dy) / 10.0)
+        if rounded:
+            nearest = np.floor(result + 0.5)
+            return np.where(nearest < result, nearest + 1, nearest).astype(np.int32)
+        return result
+
+    result = np.sqrt(dx * dx + dy * dy)
+    if not rounded:
+        return result
+    if edge_weight_type == 'CEIL_2D':
+        return np.ceil(result).astype(np.int32)
+    return np.floor(result + 0.5).astype(np.int32)
+
+
+class OnTheFlyDistances:
+    def __init__(self, x: np.ndarray, y: np.ndarray, edge_weight_type: str, rounded: bool):
+        """
+        Initialize an OnTheFlyDistances, a stand-in for the distance matrix of instances too large to store one,
+        which computes the distances of distances() when they are indexed. d[a, b] with two node indices returns
+        one distance, computed with the math module for the planar edge weight types, and index arrays return
+        the broadcast distances like fancy indexing of a matrix.
+        pre:
+        - edge_weight_type must be in EDGE_WEIGHT_TYPES.
+        post:
+        - An OnTheFlyDistances instance is created that holds only the coordinates.
+        """
+        self.x, self.y = x, y
+        self.edge_weight_type = edge_weight_type
+        self.rounded = rounded
+        self.shape = (len(x), len(x))
+        self._x, self._y = x.tolist(), y.tolist()
+
+    def __getitem__(self, key):
+        rows, columns = key
+        if self.edge_weight_type == 'GEO' or not isinstance(rows, (int, np.integer)) \
+                or not isinstance(columns, (int, np.integer)):
+            return distances(self.x, self.y, np.asarray(rows), np.asarray(columns), self.edge_weight_type, self.rounded)
+
+        dx = self._x[rows] - self._x[columns]
+        dy = self._y[rows] - self._y[columns]
+        if self.edge_weight_type == 'ATT':
+            result = math.sqrt((dx * dx + dy * dy) / 10.0)
+            if self.rounded:
+                nearest = math.floor(result + 0.5)
+                return nearest + 1 if nearest < result else nearest
+            return result
+
+        result = math.sqrt(dx * dx + dy * dy)
+        if not self.rounded:
+            return result
+        if self.edge_weight_type == 'CEIL_2D':
+            return math.ceil(result)
+        return math.floor(result + 0.5)
@@ -1,9 +1,9 @@
 from matplotlib import pyplot as plt
 from matplotlib.animation import FuncAnimation
 from code.classes.board import Board
+from code.classes.storage import load_run
 import numpy as np
 import os
-import csv
 from matplotlib import rcParams
 
 rcParams.update({
@@ -19,78 +19,71 @@ class Visualizer:
         post:
         - If a Solver instance is provided, the Visualizer is initialized with the Solver's data.
         - If parameters are provided, the Visualizer is initialized with the specified parameters.
-        - If only params are given the visualizer loads data from the Solver's CSV files.
+        - If only params are given the visualizer loads data from the Solver's output folder.
         """
         self.board = solver.board if solver != None else Board(params)
         self.p = solver.p if solver != None else params
         
         if solver != None:
             self.all_tours = solver.all_tours
+            self.tour_steps = solver.tour_steps
+            self.final_tour = solver.final_tour
+            self.move_log = solver.move_log
             self.all_lengths = solver.all_lengths
             self.all_temperatures = solver.all_temperatures
             self.all_acceptance_probs = solver.all_acceptance_probs
         else:
-            print("Loading data from CSV files...")
+            print("Loading data from output folder...")
             self._load_data()
 
     def _load_data(self):
         """
-        Load previously saved data from CSV files into the corresponding arrays.
+        Load previously saved data from the binary output folder into the corresponding arrays.
         pre:
-        - The specified folder and CSV files must exist.
-        - The CSV files must be in the correct format.
+        - The specified folder must hold a run saved by the Solver, or converted from CSV files
+          with `python -m code.classes.storage`.
         post:
-        - Populates self.all_tours, self.all_lengths, self.all_temperatures, and self.all_acceptance_probs
-        with the data read from the files.
+        - Populates self.all_tours, self.tour_steps, self.final_tour, self.all_lengths, self.all_temperatures,
+        and self.all_acceptance_probs with memory-mapped arrays that are read lazily, and self.move_log
+        if the run was recorded with the 'movelog' policy.
         - Prints a success message when loading is complete.
         """
         folder_path = os.path.abspath(os.path.join("output", self.p.folder_name))
-        
-        def read_csv(file_name):
-            file_path = os.path.join(folder_path, file_name)
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File {file_path} does not exist.")
-            with open(file_path, mode="r") as file:
-                reader = csv.reader(file)
-                next(reader)  
-                return [row for row in reader]
-
-        id_to_node = {node.ID: node for node in self.board.tour_order}
-
-        self.all_tours = [
-            [id_to_node[int(node_id)] for node_id in row]
-            for row in read_csv("all_tours.csv")
-        ]
-        self.all_lengths = [
-            float(row[0]) for row in read_csv("all_lengths.csv")
-        ]
-        self.all_temperatures = [
-            float(row[0]) for row in read_csv("all_temperatures.csv")
-        ]
-        self.all_acceptance_probs = [
-            float(row[0]) for row in read_csv("all_acceptance_probs.csv")
-        ]
+        run = load_run(folder_path)
+
+        self.all_tours = run['tours']
+        self.tour_steps = run['tour_steps']
+        self.final_tour = run['final_tour']
+        self.all_lengths = run['lengths']
+        self.all_temperatures = run['temperatures']
+        self.all_acceptance_probs = run['acceptance_probs']
+        self.move_log = run['move_log']
 
         print(f"Data loaded from folder: {folder_path}")
 
 
-    def plot_final_solution(self):
+    def _closed_path(self, tour):
         """
-        Plot the final TSP solution, comparing it to the target solution.
+        Return the x and y coordinates of a tour of node indices, closed by repeating the first node.
         """
-        x_final = [node.x for node in self.all_tours[-1]] + [self.all_tours[-1][0].x]
-        y_final = [node.y for node in self.all_tours[-1]] + [self.all_tours[-1][0].y]
+        closed = np.append(tour, tour[0])
+        return self.board.x[closed], self.board.y[closed]
 
-        x_solution = [node.x for node in self.board.tour_solution] + [self.board.tour_solution[0].x]
-        y_solution = [node.y for node in self.board.tour_solution] + [self.board.tour_solution[0].y]
+    def plot_final_solution(self):
+        """
+        Plot the final TSP solution, comparing it to the target solution if the problem set has one.
+        """
+        x_final, y_final = self._closed_path(self.final_tour)
 
         fig, ax = plt.subplots(figsize=(8, 8))
-        ax.plot(x_solution, y_solution, 'o--', color='red', markersize=6, label="Target Solution Path")
+        if self.board.solution is not None:
+            x_solution, y_solution = self._closed_path(self.board.solution)
+            ax.plot(x_solution, y_solution, 'o--', color='red', markersize=6, label="Target Solution Path")
         ax.plot(x_final, y_final, 'o-', color='blue', markersize=6, label="Final Tour Path", linewidth=2, alpha=0.5)
         
 
         # Optional: Adjust or remove node ID labels
-        for node in self.all_tours[-1]:
+        for node in self.board.nodes(self.final_tour):
             ax.text(
                 node.x, node.y, "",  # Change "" to `str(node.ID)` to display smaller node IDs.
                 color='white', fontsize=4, ha='center', va='center',  # Adjust font size here
@@ -114,8 +107,24 @@ class Visualizer:
     def plot_animation(self, target_frames=1000):
         """
         Animate the TSP solution evolution, downsampling frames to ensure a maximum of `target_frames`.
+        The frames are the tour snapshots kept by the record policy of the run, or for a run recorded
+        with the 'movelog' policy, tours reconstructed from the move log at evenly spaced steps.
         :param target_frames: The target number of frames to display in the animation.
         """
+        if self.move_log is not None:
+            frame_steps = np.unique(np.linspace(0, self.move_log.num_steps - 1, target_frames, dtype=int))
+            frame_tour = lambda frame: self.move_log.tour_at(frame_steps[frame])
+        elif len(self.all_tours) > 0:
+            total_frames = len(self.all_tours)
+            if total_frames > target_frames:
+                frame_indices = np.linspace(0, total_frames - 1, target_frames, dtype=int)
+            else:
+                frame_indices = np.arange(total_frames)
+            frame_steps = self.tour_steps[frame_indices]
+            frame_tour = lambda frame: self.all_tours[frame_indices[frame]]
+        else:
+            raise ValueError("No tour snapshots were recorded: choose a record policy other than 'none'")
+
         fig, ax = plt.subplots(figsize=(8, 8))
         ax.set_title("TSP Solution Evolution")
         ax.set_xlabel("X")
@@ -124,42 +133,27 @@ class Visualizer:
         line, = ax.plot([], [], 'o-', color='blue', markersize=6, linewidth=2, alpha=0.7)
         length_text = ax.text(0.02, 0.95, '', transform=ax.transAxes, fontsize=12, color='blue')
 
-        total_frames = len(self.all_tours)
-        if total_frames > target_frames:
-            frame_indices = np.linspace(0, total_frames - 1, target_frames, dtype=int)
-        else:
-            frame_indices = np.arange(total_frames)
-
         def init():
-            first_tour = self.all_tours[0]
-            ax.set_xlim(
-                min(node.x for node in first_tour) - 10, 
-                max(node.x for node in first_tour) + 10
-            )
-            ax.set_ylim(
-                min(node.y for node in first_tour) - 10, 
-                max(node.y for node in first_tour) + 10
-            )
+            ax.set_xlim(self.board.x.min() - 10, self.board.x.max() + 10)
+            ax.set_ylim(self.board.y.min() - 10, self.board.y.max() + 10)
             return line, length_text
 
         def update(frame):
-            tour = self.all_tours[frame_indices[frame]]
-            x = [node.x for node in tour] + [tour[0].x]
-            y = [node.y for node in tour] + [tour[0].y]
+            x, y = self._closed_path(frame_tour(frame))
 
             line.set_data(x, y)
 
-            current_length = self.all_lengths[frame_indices[frame]]
-            progress = (frame + 1) / len(frame_indices) * 100
+            current_length = self.all_lengths[frame_steps[frame]]
+            progress = (frame + 1) / len(frame_steps) * 100
             length_text.set_text(f"Length: {current_length:.2f} | Progress: {progress:.1f}%")
 
-            if frame == len(frame_indices) - 1:
+            if frame == len(frame_steps) - 1:
                 length_text.set_text(f"Final Length: {current_length:.2f} | Animation Complete")
 
             return line, length_text
 
         anim = FuncAnimation(
-            fig, update, frames=len(frame_indices), init_func=init, blit=True, interval=1, repeat=False
+            fig, update, frames=len(frame_steps), init_func=init, blit=True, interval=1, repeat=False
         )
 
         plt.show()
@@ -4,12 +4,12 @@ MAIN
 from code.classes.parser import AnnealingParameters
 from code.classes.solver import Solver
 from code.classes.visualizer import Visualizer
+from code.classes.schedules import ExponentialCooling, LogarithmicCooling, LinearCooling
+from code.classes.experiment import run_experiments, parameter_grid, write_summary
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 
-np.random.seed(50)
-
 if __name__ == '__main__':
 
     """
@@ -25,6 +25,7 @@ if __name__ == '__main__':
         cooling_rate=0.5,
         markov_chain_length=500,
         num_markov_chains=1500,
+        seed=50,
     )
 
     solver_best1 = Solver(params_best1)
@@ -44,6 +45,7 @@ if __name__ == '__main__':
         cooling_rate=0.99,
         markov_chain_length=5000,
         num_markov_chains=500,
+        seed=50,
     )
 
     solver_best2 = Solver(params_best2)
@@ -67,21 +69,9 @@ if __name__ == '__main__':
     'font.size': 15,
     })
     iteration = np.linspace(1,1000,1000)
-    temp_exp = []
-    temperature = initial_temp
-    for i in range(1000): 
-        temperature = temperature * rate
-        temp_exp.append(temperature)
-    temp_log = []
-    initial_temp = 150
-    for i in range(1000): 
-        temperature = initial_temp / (1 + beta * np.log(1 + i))
-        temp_log.append(temperature)
-    temp_lin = []
-    initial_temp = 150
-    for i in range(1000): 
-        temperature = max(0.1, initial_temp - rate * i)
-        temp_lin.append(temperature)    
+    temp_exp = ExponentialCooling(rate).temperatures(initial_temp, 1000)
+    temp_log = LogarithmicCooling(beta).temperatures(initial_temp, 1000)
+    temp_lin = LinearCooling(rate).temperatures(initial_temp, 1000)
 
     plt.figure(figsize=(12, 10))
     plt.grid()
@@ -96,66 +86,63 @@ if __name__ == '__main__':
     Different cooling schedules
     """
 
-    # exponential cooling
-    for i in range(10):    
-        params_exp = AnnealingParameters(
-            problem_set='a280',
-            save_data=True,
-            folder_name= f'Exp_{i}',
-            initial_temperature=150,
-            cooling_rate=0.5,
-            markov_chain_length=500,
-            num_markov_chains=1500,
-        )
-
-        # create board and solve the problem
-        solver_exp = Solver(params_exp)
-        solver_exp.simulated_annealing_exp_cooling()
-
-        visualizer_exp = Visualizer(solver=solver_exp)
+    # exponential cooling, 10 repetitions run in parallel
+    params_exp = AnnealingParameters(
+        problem_set='a280',
+        save_data=True,
+        folder_name='Exp',
+        initial_temperature=150,
+        cooling_rate=0.5,
+        markov_chain_length=500,
+        num_markov_chains=1500,
+    )
+    results_exp = run_experiments([params_exp], repetitions=10, cooling='exp', seed=50)
+    write_summary(results_exp, 'output/Exp_summary.csv')
+
+    for result in results_exp:
+        visualizer_exp = Visualizer(params=result['parameters'])
         visualizer_exp.plot_final_solution()
         visualizer_exp.plot_tour_length()
-        
+
         # Optional functions
         # visualizer.plot_animation()
         # visualizer.plot_summary()
 
 
-    # linear cooling
-    for i in range(10):
-        params_lin = AnnealingParameters(
-            problem_set='a280',
-            save_data=True,
-            folder_name= f'Lin_{i}',
-            initial_temperature=150,
-            cooling_rate=0.5,
-            markov_chain_length=150,
-            num_markov_chains=1000,
-        )
-        solver_lin = Solver(params_lin)
-        solver_lin.simulated_annealing_lin_cool()
-
-        visualizer_lin = Visualizer(solver=solver_lin)
+    # linear cooling, 10 repetitions run in parallel
+    params_lin = AnnealingParameters(
+        problem_set='a280',
+        save_data=True,
+        folder_name='Lin',
+        initial_temperature=150,
+        cooling_rate=0.5,
+        markov_chain_length=150,
+        num_markov_chains=1000,
+    )
+    results_lin = run_experiments([params_lin], repetitions=10, cooling='lin', seed=50)
+    write_summary(results_lin, 'output/Lin_summary.csv')
+
+    for result in results_lin:
+        visualizer_lin = Visualizer(params=result['parameters'])
         visualizer_lin.plot_final_solution()
-        visualizer_lin.plot_tour_length() 
-
-
-    # log cooling
-    iteration = np.linspace(10,150,15, dtype=int)
-    for i in iteration:
-        params_log = AnnealingParameters(
-            problem_set='a280',
-            save_data=True,
-            folder_name= f'Length_{i}',
-            initial_temperature=150,
-            cooling_rate=0.5,
-            markov_chain_length=i,
-            num_markov_chains=1000,
-        )
-
-        solver_log = Solver(params_log)
-        solver_log.simulated_annealing_log_cool()
-
-        visualizer_log = Visualizer(solver=solver_log)
+        visualizer_lin.plot_tour_length()
+
+
+    # log cooling, sweep over the Markov chain length run in parallel
+    params_log = AnnealingParameters(
+        problem_set='a280',
+        save_data=True,
+        folder_name='Length_{markov_chain_length}',
+        initial_temperature=150,
+        cooling_rate=0.5,
+        markov_chain_length=10,
+        num_markov_chains=1000,
+    )
+    grid_log = parameter_grid(params_log, markov_chain_length=np.linspace(10,150,15, dtype=int))
+    results_log = run_experiments(grid_log, cooling='log', seed=50)
+    write_summary(results_log, 'output/Length_summary.csv')
+
+    for result in results_log:
+        visualizer_log = Visualizer(params=result['parameters'])
         visualizer_log.plot_final_solution()
-        visualizer_log.plot_tour_length() 
\ No newline at end of file
+        visualizer_log.plot_tour_length()
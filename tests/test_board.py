@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from code.classes.board import Board
+from code.classes.parser import AnnealingParameters
+from code.classes.schedules import temperature_for_acceptance
+
+
+def test_neighbor_two_opt_rejects_nodes_adjacent_across_the_end():
+    board = Board(AnnealingParameters(problem_set='a280', initial_tour='greedy'))
+    tour = board.tour
+    n = len(tour)
+    first, last = int(tour[0]), int(tour[-1])
+    ranks = np.flatnonzero(board.neighbors[first] == last)
+    assert len(ranks), 'the last node of the greedy tour is a candidate neighbor of the first'
+
+    for direction in (0, 1):
+        assert board.neighbor_two_opt(first, int(ranks[0]), direction) is None
+    for node in range(n):
+        for rank in range(board.neighbors.shape[1]):
+            for direction in (0, 1):
+                move = board.neighbor_two_opt(node, rank, direction)
+                assert move is None or move[2] - move[1] < n - 2
+
+
+def test_recommended_temperature_matches_acceptance_target():
+    board = Board(AnnealingParameters(problem_set='eil51', initial_tour='nearest_neighbor'))
+    deltas = board.sample_two_opt_deltas(1000, 'neighbor', 0)
+    temperature = board.recommended_temperature(0.2)
+    assert temperature == temperature_for_acceptance(deltas, 0.2)
+    uphill = deltas[deltas > 0]
+    assert np.mean(np.exp(-uphill / temperature)) == pytest.approx(0.2)
@@ -0,0 +1,30 @@
+import dataclasses
+import numpy as np
+import pytest
+from code.classes.parser import AnnealingParameters
+from code.classes.solver import Solver
+
+pytest.importorskip('numba')
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    {'proposal': 'neighbor', 'initial_tour': 'greedy'},
+    {'moves': {'two_opt': 0.5, 'node_swap': 0.2, 'segment_insertion': 0.3}},
+    {'accepted_moves_per_chain': 200, 'patience': 5},
+])
+def test_numba_kernel_matches_numpy_loop(overrides):
+    params = AnnealingParameters(
+        problem_set='pcb442', save_data=False, markov_chain_length=1000, num_markov_chains=30, seed=7,
+        initial_temperature=50, cooling_rate=0.9, record_policy='none', **overrides,
+    )
+    runs = {}
+    for kernel in ('numba', 'numpy'):
+        solver = Solver(dataclasses.replace(params, kernel=kernel))
+        assert solver.use_kernel == (kernel == 'numba')
+        solver.simulated_annealing_exp_cooling()
+        runs[kernel] = solver
+
+    assert np.array_equal(runs['numba'].board.tour, runs['numpy'].board.tour)
+    assert np.array_equal(runs['numba'].all_lengths, runs['numpy'].all_lengths)
+    assert runs['numba'].stop_reason == runs['numpy'].stop_reason
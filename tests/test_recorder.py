@@ -0,0 +1,40 @@
+import dataclasses
+import numpy as np
+import pytest
+from code.classes.parser import AnnealingParameters
+from code.classes.solver import Solver
+from code.classes.storage import load_run
+
+
+def test_run_without_steps_saves_its_final_tour(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    params = AnnealingParameters(
+        problem_set='eil51', save_data=True, folder_name='empty', initial_temperature=10, cooling_rate=0.9,
+        markov_chain_length=100, num_markov_chains=0,
+    )
+    solver = Solver(params)
+    solver.simulated_annealing_exp_cooling()
+
+    run = load_run(str(tmp_path / 'output' / 'empty'))
+    assert run['metadata']['complete']
+    assert len(run['lengths']) == 0
+    assert np.array_equal(run['final_tour'], solver.board.tour)
+
+
+@pytest.mark.parametrize('save_data', [False, True])
+def test_move_log_replays_every_step(tmp_path, monkeypatch, save_data):
+    monkeypatch.chdir(tmp_path)
+    params = AnnealingParameters(
+        problem_set='eil51', save_data=save_data, folder_name='movelog', initial_temperature=10, cooling_rate=0.9,
+        markov_chain_length=100, num_markov_chains=5, keyframe_interval=37, chunk_size=64, seed=1,
+        moves={'two_opt': 0.5, 'node_swap': 0.2, 'segment_insertion': 0.3},
+    )
+    snapshots = Solver(dataclasses.replace(params, save_data=False, record_policy='every'))
+    snapshots.simulated_annealing_exp_cooling()
+    logged = Solver(dataclasses.replace(params, record_policy='movelog'))
+    logged.simulated_annealing_exp_cooling()
+
+    move_log = logged.recorder.move_log
+    tours = snapshots.recorder.tours
+    for step in [*range(len(tours)), 450, 3, 200, 37, 36]:
+        assert np.array_equal(move_log.tour_at(step), tours[step])
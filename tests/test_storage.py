@@ -0,0 +1,36 @@
+import csv
+import numpy as np
+from code.classes import storage
+from code.classes.storage import convert_csv_folder, load_run
+
+HEADER = ('Problem Set: eil51, Initial Temperature: 10, Cooling Rate: 0.9, Markov Chain Length: 7, '
+          'Number of Markov Chains: 3')
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([HEADER])
+        writer.writerows(rows)
+
+
+def test_convert_csv_folder_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'CSV_CHUNK_SIZE', 20)
+    rng = np.random.default_rng(0)
+    tours = np.array([rng.permutation(9) for _ in range(21)], dtype=np.int32)
+    series = {name: rng.random(21) for name in storage.SERIES}
+    write_csv(tmp_path / 'all_tours.csv', (tours + 1).tolist())
+    for name, values in series.items():
+        write_csv(tmp_path / f'all_{name}.csv', [[value] for value in values.tolist()])
+
+    convert_csv_folder(str(tmp_path))
+
+    run = load_run(str(tmp_path))
+    assert run['metadata']['complete']
+    assert run['metadata']['parameters']['cooling_rate'] == 0.9
+    assert np.array_equal(run['tours'], tours)
+    assert np.array_equal(run['tour_steps'], np.arange(21))
+    assert np.array_equal(run['final_tour'], tours[-1])
+    for name, values in series.items():
+        assert np.array_equal(run[name], values)
+    assert run['move_log'] is None
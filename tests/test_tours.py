@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from code.classes.board import Board, TWO_OPT, NODE_TWO_OPT
+from code.classes.parser import AnnealingParameters
+from code.classes.tours import TwoLevelList
+
+
+def edges(tour):
+    """
+    The undirected edges of a tour, which are the same for both orientations and every rotation.
+    """
+    return {frozenset(edge) for edge in zip(tour.tolist(), np.roll(tour, -1).tolist())}
+
+
+@pytest.mark.parametrize('n', [5, 9, 50, 400])
+def test_two_level_list_matches_array_reversal(n):
+    rng = np.random.default_rng(n)
+    tl = TwoLevelList(rng.permutation(n).astype(np.int32))
+
+    for _ in range(2000):
+        a, b = (int(node) for node in rng.integers(0, n, 2))
+
+        # Reverse the path from a to b on the array the list holds before the move
+        reference = tl.to_array()
+        i, j = int(np.flatnonzero(reference == a)[0]), int(np.flatnonzero(reference == b)[0])
+        path = np.arange(i, i + (j - i) % n + 1) % n
+        reference[path] = reference[path[::-1]]
+
+        tl.reverse(a, b)
+        tour = tl.to_array()
+        assert tour[0] == 0
+        assert np.array_equal(np.sort(tour), np.arange(n))
+        assert edges(tour) == edges(reference)
+
+        position = np.empty(n, dtype=np.int64)
+        position[tour] = np.arange(n)
+        for node in rng.integers(0, n, 5).tolist():
+            assert tl.next(node) == tour[(position[node] + 1) % n]
+            assert tl.prev(node) == tour[position[node] - 1]
+
+
+def test_two_level_backend_matches_array_backend():
+    params = AnnealingParameters(problem_set='a280', initial_tour='greedy')
+    array = Board(AnnealingParameters(**{**params.__dict__, 'tour_backend': 'array'}))
+    linked = Board(AnnealingParameters(**{**params.__dict__, 'tour_backend': 'two_level'}))
+    n = len(array.tour)
+    rng = np.random.default_rng(0)
+
+    for _ in range(2000):
+        node1, node2 = (int(node) for node in rng.integers(0, n, 2))
+        following1, following2 = linked.linked.next(node1), linked.linked.next(node2)
+        if node2 in (node1, following1) or node1 == following2:
+            continue
+
+        # The node move replaces the edges from node1 and node2 to their successors in the list, which may run
+        # in the opposite direction of the array; the 2-opt move that replaces the same edges reverses the path
+        # after the first of the two edges up to the second
+        position = array.position
+        starts = sorted(
+            int(position[a]) if (position[b] - position[a]) % n == 1 else int(position[b])
+            for a, b in ((node1, following1), (node2, following2))
+        )
+        array_move = (TWO_OPT, starts[0] + 1, starts[1], 0)
+        linked_move = (NODE_TWO_OPT, node1, node2, 0)
+        assert linked.move_delta(linked_move) == pytest.approx(array.move_delta(array_move))
+
+        if rng.random() < 0.5:
+            array.apply_move(array_move)
+            linked.apply_move(linked_move)
+            assert edges(linked.tour) == edges(array.tour)
+
+    assert linked.calculate_tour_distance() == pytest.approx(array.calculate_tour_distance())